@@ -0,0 +1,214 @@
+import json
+import math
+import os
+import statistics
+
+import history
+
+# safety margin on the predicted computation times
+TIME_MARGIN = 1.25
+# fixed cost of a job (start-up, datasets reading...)
+JOB_OVERHEAD_S = 600
+# safety margin on the predicted memory peaks
+MEM_MARGIN = 1.2
+# size (bytes per cell) of the input formats when no dataset has been
+# converted yet, measured on the OpenSciVis datasets
+DISK_BYTES_PER_CELL = {
+    "dipha/expl": 48.0,
+    "vtu/expl": 11.0,
+    "tsc/expl": 11.0,
+    # binary format, int64 entries (25 bytes per cell in ASCII)
+    "phat/expl": 38.5,
+    "pers/expl": 15.0,
+    "eirene/expl": 30.0,
+    "oin/expl": 30.0,
+    "dipha/impl": 1.0,
+    "vti/impl": 1.5,
+    "pers/impl": 1.0,
+    "nc/impl": 1.0,
+}
+
+
+def parse_walltime(txt):
+    """Seconds in a [[HH:]MM:]SS walltime"""
+    secs = 0
+    for part in txt.split(":"):
+        secs = secs * 60 + int(part)
+    return secs
+
+
+def format_walltime(secs):
+    secs = int(math.ceil(secs))
+    return f"{secs // 3600:02d}:{secs % 3600 // 60:02d}:{secs % 60:02d}"
+
+
+def format_key(fname):
+    """Extension and complex type of a dataset file ("vtu/expl")"""
+    complex_type = "impl" if "_order_impl" in fname else "expl"
+    return f"{fname.split('.')[-1]}/{complex_type}"
+
+
+def disk_rates(fnames):
+    """Bytes per cell of every input format, from the converted datasets
+    when available"""
+    samples = {}
+    for fname in fnames:
+        n_cells = history.dataset_size(os.path.basename(fname))[1]
+        # skip the files being written
+        if os.path.isfile(fname) and os.path.getsize(fname) > 0 and n_cells > 0:
+            key = format_key(fname)
+            samples.setdefault(key, []).append(os.path.getsize(fname) / n_cells)
+    rates = dict(DISK_BYTES_PER_CELL)
+    rates.update({k: statistics.median(v) for k, v in samples.items()})
+    return rates
+
+
+def disk_usage(fnames):
+    """Disk usage (bytes) of the dataset files per input format: actual
+    size of the existing files, projected size of the others.
+
+    Returns two dicts (existing and projected sizes)
+    """
+    rates = disk_rates(fnames)
+    existing = {}
+    projected = {}
+    for fname in fnames:
+        key = format_key(fname)
+        if os.path.isfile(fname):
+            existing[key] = existing.get(key, 0) + os.path.getsize(fname)
+        else:
+            n_cells = history.dataset_size(os.path.basename(fname))[1]
+            size = n_cells * rates.get(key, 0.0)
+            projected[key] = projected.get(key, 0) + size
+    return existing, projected
+
+
+def pack_jobs(runs, walltime):
+    """Group runs into jobs whose predicted duration fits in the
+    walltime (first-fit decreasing). Runs are dicts with a predicted
+    "time" (s) and "mem" (MB).
+
+    Returns a list of jobs (lists of runs)
+    """
+    capacity = walltime - JOB_OVERHEAD_S
+    jobs = []
+    loads = []
+    for run in sorted(runs, key=lambda r: r["time"], reverse=True):
+        cost = run["time"] * TIME_MARGIN
+        for i, load in enumerate(loads):
+            if load + cost <= capacity:
+                jobs[i].append(run)
+                loads[i] += cost
+                break
+        else:
+            # runs longer than the walltime get a job of their own
+            jobs.append([run])
+            loads.append(cost)
+    return jobs
+
+
+def make_arrays(runs, walltime):
+    """Job arrays of the campaign: runs are grouped by number of threads
+    and memory class (power of two GB) so that every job of an array
+    requests the cores and the memory its runs need"""
+    classes = {}
+    for run in runs:
+        mem_gb = max(1, math.ceil(run["mem"] * MEM_MARGIN / 1024))
+        mem_gb = 2 ** math.ceil(math.log2(mem_gb))
+        classes.setdefault((run["#threads"], mem_gb), []).append(run)
+
+    arrays = []
+    for (ncpus, mem_gb), cruns in sorted(classes.items()):
+        jobs = pack_jobs(cruns, walltime)
+        duration = max(sum(r["time"] for r in job) for job in jobs)
+        arrays.append(
+            {
+                "name": f"{ncpus}T_{mem_gb}G",
+                "ncpus": ncpus,
+                "mem_gb": mem_gb,
+                "walltime": min(
+                    walltime, math.ceil(duration * TIME_MARGIN) + JOB_OVERHEAD_S
+                ),
+                "jobs": jobs,
+            }
+        )
+    return arrays
+
+
+PBS_TEMPLATE = """#!/bin/bash
+#PBS -S /bin/bash
+#PBS -N pdiags_{name}
+#PBS -l select=1:ncpus={ncpus}:mem={mem_gb}gb
+#PBS -l walltime={walltime}
+#PBS -j oe
+#PBS -o {out_dir}/
+{array}{queue}
+cd "$PBS_O_WORKDIR" || exit 1
+python3 main.py job {plan} {index} "${{PBS_ARRAY_INDEX:-0}}"
+"""
+
+SLURM_TEMPLATE = """#!/bin/bash
+#SBATCH --job-name=pdiags_{name}
+#SBATCH --nodes=1
+#SBATCH --cpus-per-task={ncpus}
+#SBATCH --mem={mem_gb}G
+#SBATCH --time={walltime}
+#SBATCH --output={out_dir}/%x_%a.out
+{array}{queue}
+cd "$SLURM_SUBMIT_DIR" || exit 1
+python3 main.py job {plan} {index} "${{SLURM_ARRAY_TASK_ID:-0}}"
+"""
+
+
+def emit_script(kind, array, index, plan, out_dir, queue=None):
+    n_jobs = len(array["jobs"])
+    if kind == "pbs":
+        template = PBS_TEMPLATE
+        # PBS Pro rejects single-job arrays
+        arr = f"#PBS -J 0-{n_jobs - 1}\n" if n_jobs > 1 else ""
+        que = f"#PBS -q {queue}\n" if queue else ""
+    else:
+        template = SLURM_TEMPLATE
+        arr = f"#SBATCH --array=0-{n_jobs - 1}\n"
+        que = f"#SBATCH --partition={queue}\n" if queue else ""
+    return template.format(
+        name=array["name"],
+        ncpus=array["ncpus"],
+        mem_gb=array["mem_gb"],
+        walltime=format_walltime(array["walltime"]),
+        out_dir=out_dir,
+        array=arr,
+        queue=que,
+        plan=plan,
+        index=index,
+    )
+
+
+def write_plan(arrays, params, kind, out_dir="jobs", queue=None):
+    """Write the plan (runs of every job and campaign parameters), one
+    job array script per array and a submission script"""
+    os.makedirs(out_dir, exist_ok=True)
+    plan = f"{out_dir}/plan.json"
+    with open(plan, "w") as dst:
+        json.dump({"params": params, "arrays": arrays}, dst, indent=4)
+
+    submit = "qsub" if kind == "pbs" else "sbatch"
+    scripts = []
+    for i, array in enumerate(arrays):
+        script = f"{out_dir}/{kind}_{array['name']}.sh"
+        with open(script, "w") as dst:
+            dst.write(emit_script(kind, array, i, plan, out_dir, queue))
+        scripts.append(script)
+
+    with open(f"{out_dir}/submit.sh", "w") as dst:
+        dst.write("#!/bin/bash\n")
+        dst.writelines(f"{submit} {script}\n" for script in scripts)
+    os.chmod(f"{out_dir}/submit.sh", 0o755)
+    return scripts
+
+
+def load_job(plan, array, index):
+    """Campaign parameters and runs of one job of a plan"""
+    with open(plan) as src:
+        data = json.load(src)
+    return data["params"], data["arrays"][array]["jobs"][index]
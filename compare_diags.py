@@ -4,42 +4,152 @@ import argparse
 import difflib
 import itertools
 import math
+import os
+import tempfile
+import warnings
 
-import topologytoolkit as ttk
-import vtk
+import numpy as np
 
+import diagram_store
+import history
 
-def read_file(fname):
-    ext = fname.split(".")[-1]
-    if ext == "vtu":
-        reader = vtk.vtkXMLUnstructuredGridReader()
-    elif ext == "dipha":
-        reader = ttk.ttkDiphaReader()
-    elif ext == "gudhi":
-        reader = ttk.ttkGudhiPersistenceDiagramReader()
+DIPHA_MAGIC = 8067171840
+DIPHA_DIAGRAM = 2
+
+
+def read_gudhi(fname):
+    """Pair types, births, deaths and finiteness of the pairs of a
+    diagram in the Gudhi format ("[field] dim birth death" lines), with
+    the conventions of ttkGudhiPersistenceDiagramReader"""
+    try:
+        with warnings.catch_warnings():
+            # empty diagrams
+            warnings.simplefilter("ignore", UserWarning)
+            vals = np.loadtxt(fname, comments="#", ndmin=2)
+    except ValueError:
+        # lines with different numbers of columns
+        rows = []
+        with open(fname) as src:
+            for line in src:
+                if line.strip() and not line.startswith("#"):
+                    rows.append([float(v) for v in line.split()[:4]])
+        ncols = max((len(r) for r in rows), default=0)
+        vals = np.full((len(rows), ncols), np.nan)
+        for i, row in enumerate(rows):
+            # right-aligned: the last columns are birth and death
+            vals[i, ncols - len(row) :] = row
+    ncols = min(vals.shape[1], 4)
+    vals = vals[:, :ncols]
+    if ncols < 2 or vals.shape[0] == 0:
+        return None
+    births = vals[:, ncols - 2]
+    deaths = np.where(np.isfinite(vals[:, ncols - 1]), vals[:, ncols - 1], -1.0)
+    if ncols > 2:
+        dims = np.nan_to_num(vals[:, ncols - 3], nan=-1.0).astype(np.int64)
     else:
+        dims = np.full(len(births), -1, dtype=np.int64)
+    # global pair & essential classes die at the highest death
+    infinite = (dims == -1) | (deaths == -1)
+    deaths[infinite] = deaths.max()
+    return dims, births, deaths, ~infinite
+
+
+def read_dipha(fname):
+    """Pair types, births, deaths and finiteness of the pairs of a Dipha
+    persistence diagram, with the conventions of ttkDiphaReader"""
+    with open(fname, "rb") as src:
+        magic, ftype = np.fromfile(src, dtype="<i8", count=2)
+        if magic != DIPHA_MAGIC or ftype != DIPHA_DIAGRAM:
+            raise ValueError(f"{fname} is not a Dipha persistence diagram")
+        n_pairs = int(np.fromfile(src, dtype="<i8", count=1)[0])
+        rec = np.fromfile(
+            src,
+            dtype=np.dtype([("dim", "<i8"), ("birth", "<f8"), ("death", "<f8")]),
+            count=n_pairs,
+        )
+    if len(rec) == 0:
         return None
+    dims = rec["dim"]
+    # -1: global extrema pair, < -1: essential classes
+    ptypes = np.where(dims == -1, 0, np.where(dims < -1, -dims - 1, dims))
+    return ptypes, rec["birth"], rec["death"], dims >= 0
+
+
+def read_vtu(fname):
+    """Pair types, births, deaths and finiteness of the pairs of a TTK
+    persistence diagram (the diagonal has the -1 pair type), None if it
+    has no point or lacks the PairType/IsFinite arrays"""
+    import vtk
+    from vtk.util.numpy_support import vtk_to_numpy
+
+    reader = vtk.vtkXMLUnstructuredGridReader()
     reader.SetFileName(fname)
     reader.Update()
-    return reader.GetOutput()
+    diag = reader.GetOutput()
+    pts = diag.GetPoints()
+    if pts is None:
+        return None
+    ptypes = diag.GetCellData().GetArray("PairType")
+    finite = diag.GetCellData().GetArray("IsFinite")
+    if ptypes is None or finite is None:
+        return None
+    ptypes = vtk_to_numpy(ptypes)
+    finite = vtk_to_numpy(finite).astype(bool)
+    coords = vtk_to_numpy(pts.GetData()).astype(np.float64)
+    # the death point of pair i
+    ids = np.minimum(2 * np.arange(len(ptypes)) + 1, len(coords) - 1)
+    return ptypes, coords[ids, 0], coords[ids, 1], finite
+
+
+def read_pairs(diag, max_order=None):
+    """Pairs (birth, death) of a diagram file (.gudhi, .dipha or .vtu) and
+    their finiteness, as two lists of three arrays (one per pair type)
+    sorted lexicographically; two empty lists if the diagram has no
+    pair. Infinite pairs die at `max_order`, by default the maximum vertex
+    order of the dataset whose name starts the diagram file name (as in
+    the binary stores), at the highest death if its size is unknown."""
+    ext = diag.split(".")[-1]
+    readers = {"gudhi": read_gudhi, "dipha": read_dipha, "vtu": read_vtu}
+    if ext not in readers:
+        raise ValueError(f"Unsupported diagram format: {diag}")
+    res = readers[ext](diag)
+    if res is None:
+        return [], []
+    ptypes, births, deaths, finite = res
+    if max_order is None:
+        n_verts = history.dataset_size(os.path.basename(diag))[0]
+        max_order = n_verts - 1 if n_verts > 0 else None
+    if max_order is not None:
+        deaths = np.where(finite, deaths, max_order)
+    pairs = np.column_stack([births, deaths])
+    if ext != "vtu":
+        # same rounding as the single-precision points of the TTK readers
+        pairs = pairs.astype(np.float32).astype(np.float64)
+    res_pairs, res_finite = [], []
+    for j in range(3):
+        sel = ptypes == j
+        pr = np.ascontiguousarray(pairs[sel])
+        # lexicographic order, faster on (birth, death) complex numbers
+        order = np.argsort(pr.view(np.complex128).ravel())
+        res_pairs.append(pr[order])
+        res_finite.append(finite[sel][order])
+    return res_pairs, res_finite
 
 
 def read_diag(diag, filter_inf=False):
-    diag = read_file(diag)
-    ptype = diag.GetCellData().GetArray("PairType")
-    ifin = diag.GetCellData().GetArray("IsFinite")
-    pts = diag.GetPoints()
-    if pts is None:
-        return []
-    # assert 2 * ptype.GetNumberOfTuples() - 2 == pts.GetNumberOfPoints()
-    pairs = [list() for i in range(3)]
-    for i in range(ptype.GetNumberOfTuples()):
-        j = int(ptype.GetTuple1(i))
-        if j == -1 or (filter_inf and not bool(ifin.GetTuple1(i))):
-            continue
-        pairs[j].append(pts.GetPoint(2 * i + 1)[0:2])
-    for pr in pairs:
-        pr.sort()
+    """Pairs (birth, death) of a diagram as three sorted arrays of shape
+    (n, 2), one per pair type; an empty list if the diagram has no pair.
+
+    The binary store of the diagram (see diagram_store.py) is mapped
+    when up to date, the diagram file is parsed otherwise.
+    """
+    store = diagram_store.find(diag)
+    if store is not None:
+        _, pairs, finite = diagram_store.load(store)
+    else:
+        pairs, finite = read_pairs(diag)
+    if filter_inf:
+        pairs = [pr[fin] for pr, fin in zip(pairs, finite)]
     return pairs
 
 
@@ -99,22 +209,26 @@ def compare_pairs(pairs0, pairs1, ptype, show_diff):
         try:
             import diagram_distance as diagdist
 
-            # store rem0 and rem1 in temporary files
-            with open("/tmp/diag0.gudhi", "w") as dst:
-                for b, d in rem0:
-                    dst.write(f"0 {b} {d}\n")
-            with open("/tmp/diag1.gudhi", "w") as dst:
-                for b, d in rem1:
-                    dst.write(f"0 {b} {d}\n")
-
-            # compute the distance with bottleneck
-            dists = diagdist.get_diag_dist(
-                "/tmp/diag0.gudhi",
-                "/tmp/diag1.gudhi",
-                1.0,
-                diagdist.DistMethod.AUCTION,
-                3600,
-            )
+            # store rem0 and rem1 in temporary files (private to this
+            # process)
+            with tempfile.TemporaryDirectory() as tmpdir:
+                diag0 = os.path.join(tmpdir, "diag0.gudhi")
+                diag1 = os.path.join(tmpdir, "diag1.gudhi")
+                with open(diag0, "w") as dst:
+                    for b, d in rem0:
+                        dst.write(f"0 {b} {d}\n")
+                with open(diag1, "w") as dst:
+                    for b, d in rem1:
+                        dst.write(f"0 {b} {d}\n")
+
+                # compute the distance with bottleneck
+                dists = diagdist.get_diag_dist(
+                    diag0,
+                    diag1,
+                    1.0,
+                    diagdist.DistMethod.AUCTION,
+                    3600,
+                )
             try:
                 wass_dist = dists["min-sad"]
             except KeyError:
@@ -151,6 +265,12 @@ def main(diag0, diag1, show_diff=True, filter_inf=False):
         diag_type = ["min-saddle", "saddle-saddle", "saddle-max"]
     res = dict()
     for p0, p1, t in zip(pairs0, pairs1, diag_type):
+        if np.array_equal(p0, p1):
+            print(f"> Identical {t} pairs")
+            res[t] = 0.0
+            continue
+        p0 = [tuple(p) for p in p0.tolist()]
+        p1 = [tuple(p) for p in p1.tolist()]
         res[t] = compare_pairs(p0, p1, t, show_diff)
     return res
 
@@ -12,9 +12,11 @@ def main():
     p = pathlib.Path("diagrams")
     backends = set()
     for diag_ref in sorted(p.glob(f"*{cpx}_{backend_ref}*")):
+        if diag_ref.suffix == ".npz":
+            continue
         ds_root = "_".join(diag_ref.stem.split("_")[:-1])
         for diag in sorted(p.glob(f"{ds_root}*")):
-            if backend_ref in diag.name:
+            if backend_ref in diag.name or diag.suffix == ".npz":
                 continue
             backends.add(diag.stem.split("_")[-1])
 
@@ -24,9 +26,13 @@ def main():
 
     for bk in backends:
         for diag_ref in sorted(p.glob(f"*{cpx}_{backend_ref}*")):
+            if diag_ref.suffix == ".npz":
+                continue
             ds_root = "_".join(diag_ref.stem.split("_")[:-1])
             ds_bk = f"{ds_root}_{bk}"
             for diag in sorted(p.glob(f"*{ds_bk}*")):
+                if diag.suffix == ".npz":
+                    continue
                 res = compare_diags.main(str(diag_ref), str(diag), False)
                 dists.setdefault(bk, []).append(sum(res.values()))
 
@@ -6,6 +6,7 @@ import time
 
 from paraview import simple
 
+import phat2gudhi
 import vti2nc3
 
 RESAMPL_3D = 192
@@ -14,7 +15,7 @@ RESAMPL_1D = 1024 ** 2
 logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level=logging.INFO)
 
 
-def write_output(outp, fname, out_dir, explicit):
+def write_output(outp, fname, out_dir, explicit, phat_ascii=False):
     if out_dir:
         fname = out_dir + "/" + fname
 
@@ -32,6 +33,15 @@ def write_output(outp, fname, out_dir, explicit):
         simple.SaveData(fname + ".tsc", proxy=outp)
         # PHAT ASCII boundary_matrix file format
         simple.SaveData(fname + ".phat", proxy=outp)
+        if not phat_ascii:
+            # PHAT binary boundary_matrix file format (no parsing)
+            ascii_size, binary_size = phat2gudhi.to_binary(fname + ".phat")
+            logging.info(
+                "PHAT binary boundary matrix: %.1f MB (ASCII: %.1f MB, %+.1f%%)",
+                binary_size / 1e6,
+                ascii_size / 1e6,
+                100.0 * (binary_size - ascii_size) / max(ascii_size, 1),
+            )
         if not partial:
             # Perseus Uniform Triangulation (Perseus)
             simple.SaveData(fname + ".pers", proxy=outp)
@@ -48,6 +58,20 @@ def write_output(outp, fname, out_dir, explicit):
         vti2nc3.main(fname + ".vti")
 
 
+def output_files(stem, explicit):
+    """Names of the files written by write_output"""
+    partial = pathlib.Path(".not_all_apps").exists()
+    if explicit:
+        exts = ["dipha", "vtu", "tsc", "phat"]
+        if not partial:
+            exts += ["pers", "eirene", "oin"]
+    elif partial:
+        exts = []
+    else:
+        exts = ["dipha", "vti", "pers", "nc"]
+    return [f"{stem}.{ext}" for ext in exts]
+
+
 def read_file(input_file):
     extension = input_file.split(".")[-1]
     if extension == "vti":
@@ -118,7 +142,7 @@ def slice_data(input_dataset, slice_type, dims):
     return rsi
 
 
-def pipeline(raw_file, raw_stem, dims, slice_type, out_dir):
+def pipeline(raw_file, raw_stem, dims, slice_type, out_dir, phat_ascii=False):
     reader = read_file(raw_file)
     # convert input scalar field to float
     calc = simple.Calculator(Input=reader)
@@ -146,13 +170,12 @@ def pipeline(raw_file, raw_stem, dims, slice_type, out_dir):
     # remove vtkGhostType arrays (only applies on vtu & vtp)
     rgi = simple.RemoveGhostInformation(Input=tetrah)
     # save explicit mesh
-    write_output(rgi, raw_stem + "_order_expl", out_dir, True)
+    write_output(rgi, raw_stem + "_order_expl", out_dir, True, phat_ascii)
 
 
-def main(raw_file, out_dir="", resampl_size=RESAMPL_3D, slice_type=SliceType.VOL):
-    if raw_file == "":
-        return
-
+def output_stem(raw_file, resampl_size, slice_type):
+    """Dimensions and name prefix of the datasets generated from a raw
+    file"""
     if slice_type == SliceType.VOL:
         dims = [resampl_size] * 3
     elif slice_type == SliceType.SURF:
@@ -172,11 +195,35 @@ def main(raw_file, out_dir="", resampl_size=RESAMPL_3D, slice_type=SliceType.VOL
     except IndexError:
         # not an Open-Scivis-Datasets raw file (elevation or random)
         raw_stem = f"{raw_stem}_{extent_s}"
+    return dims, raw_stem
+
+
+def projected_files(raw_file, resampl_size, slice_type):
+    """Names of the dataset files that main would generate"""
+    _, raw_stem = output_stem(raw_file, resampl_size, slice_type)
+    files = output_files(raw_stem + "_order_expl", True)
+    if slice_type != SliceType.LINE:
+        files += output_files(raw_stem + "_order_impl", False)
+    return files
+
+
+def main(
+    raw_file,
+    out_dir="",
+    resampl_size=RESAMPL_3D,
+    slice_type=SliceType.VOL,
+    phat_ascii=False,
+):
+    if raw_file == "":
+        return
+
+    dims, raw_stem = output_stem(raw_file, resampl_size, slice_type)
+    extent_s = "x".join([str(d) for d in dims])
 
     logging.info("Converting %s to input formats (resampled to %s)", raw_file, extent_s)
     beg = time.time()
 
-    pipeline(raw_file, raw_stem, dims, slice_type, out_dir)
+    pipeline(raw_file, raw_stem, dims, slice_type, out_dir, phat_ascii)
 
     end = time.time()
     logging.info("Converted %s (took %ss)", raw_file, round(end - beg, 3))
@@ -209,6 +256,11 @@ if __name__ == "__main__":
         action="store_true",
         help="Generate a 1D line",
     )
+    parser.add_argument(
+        "--phat_ascii",
+        action="store_true",
+        help="Write the PHAT boundary matrices in the ASCII format",
+    )
     args = parser.parse_args()
 
     if args.line and args.slice:
@@ -227,4 +279,4 @@ if __name__ == "__main__":
         if args.resampling_size is None:
             args.resampling_size = RESAMPL_3D
 
-    main(args.raw_file, args.dest_dir, args.resampling_size, stype)
+    main(args.raw_file, args.dest_dir, args.resampling_size, stype, args.phat_ascii)
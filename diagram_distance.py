@@ -106,7 +106,8 @@ def get_file_list(diag_file):
         logging.error("File not found: %s", diag_file)
         return None
     stem = "_".join(p.stem.split("_")[:-1])
-    l = sorted(p.parent.glob(f"{stem}*"))
+    # binary stores are read in place of their diagram
+    l = sorted(e for e in p.parent.glob(f"{stem}*") if e.suffix != ".npz")
     idx = next(i for i, v in enumerate(l) if "_Dipha" in str(v))
     l[0], l[idx] = l[idx], l[0]
     # filter out FTM diagrams
@@ -0,0 +1,133 @@
+import io
+import json
+import os
+import struct
+import zipfile
+
+import numpy as np
+
+import history
+
+# pair types of the 2D and 3D diagrams
+PAIR_TYPES_2D = ["#Min-saddle", "#Saddle-max"]
+PAIR_TYPES_3D = ["#Min-saddle", "#Saddle-saddle", "#Saddle-max"]
+
+
+def store_file(diag):
+    """Path of the binary store of a diagram file (next to it)"""
+    if diag.endswith(".npz"):
+        return diag
+    return f"{diag}.npz"
+
+
+def find(diag):
+    """Binary store of a diagram, None if missing or older than the
+    diagram (re-written since the conversion)"""
+    store = store_file(diag)
+    if not os.path.isfile(store):
+        return None
+    if store != diag and os.path.isfile(diag):
+        if os.stat(store).st_mtime_ns < os.stat(diag).st_mtime_ns:
+            return None
+    return store
+
+
+def write(fname, pairs, finite, header):
+    """Write the sorted pairs and their finiteness (one array per pair
+    type) into an uncompressed .npz file, atomically"""
+    arrays = {"header": np.frombuffer(json.dumps(header).encode(), dtype=np.uint8)}
+    for j, (pr, fin) in enumerate(zip(pairs, finite)):
+        arrays[f"pairs{j}"] = pr
+        arrays[f"finite{j}"] = fin
+    tmp = f"{fname}.part"
+    with open(tmp, "wb") as dst:
+        np.savez(dst, **arrays)
+    os.replace(tmp, fname)
+
+
+def convert(diag, dataset=None, backend=None):
+    """Convert a diagram file (.gudhi, .dipha or .vtu) into its binary
+    store. Infinite pairs die at the maximum vertex order of the dataset
+    (as after gudhi_diag_inf.py, see history.dataset_vertices), at the
+    highest death if unknown.
+
+    Returns the header of the store
+    """
+    import compare_diags
+
+    if dataset is not None:
+        n_verts = history.dataset_vertices(dataset)
+    else:
+        n_verts = history.dataset_size(os.path.basename(diag))[0]
+    max_order = n_verts - 1 if n_verts > 0 else None
+    pairs, finite = compare_diags.read_pairs(diag, max_order)
+    header = {
+        "backend": backend,
+        "dataset": dataset,
+        "source": os.path.basename(diag),
+        "#Vertices": n_verts,
+        "counts": [len(pr) for pr in pairs],
+        "#Infinite": int(sum(np.count_nonzero(~fin) for fin in finite)),
+    }
+    write(store_file(diag), pairs, finite, header)
+    return header
+
+
+def pair_counts(header, diag):
+    """Pair numbers of a store header, with the keys of the results"""
+    names = PAIR_TYPES_2D if "x1_" in diag else PAIR_TYPES_3D
+    res = dict(zip(names, header["counts"]))
+    res["#Total pairs"] = sum(header["counts"])
+    return res
+
+
+def member_offset(src, info):
+    """Offset of the data of an array stored in a .npz file"""
+    src.seek(info.header_offset)
+    local = src.read(30)
+    name_len, extra_len = struct.unpack("<HH", local[26:30])
+    src.seek(info.header_offset + 30 + name_len + extra_len)
+    version = np.lib.format.read_magic(src)
+    if version == (1, 0):
+        shape, fortran, dtype = np.lib.format.read_array_header_1_0(src)
+    else:
+        shape, fortran, dtype = np.lib.format.read_array_header_2_0(src)
+    return src.tell(), shape, fortran, dtype
+
+
+def read_header(fname):
+    """Header of a binary store (backend, dataset, pair numbers...)"""
+    with zipfile.ZipFile(fname) as zf:
+        raw = np.load(io.BytesIO(zf.read("header.npy")))
+    return json.loads(raw.tobytes())
+
+
+def load(fname):
+    """Header, pairs and finiteness of a binary store. The arrays are
+    read-only memory maps of the file (no parsing, no copy)"""
+    header = read_header(fname)
+    arrays = {}
+    with zipfile.ZipFile(fname) as zf, open(fname, "rb") as src:
+        for info in zf.infolist():
+            name = info.filename[: -len(".npy")]
+            if name == "header":
+                continue
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{fname}: compressed arrays cannot be mapped")
+            offset, shape, fortran, dtype = member_offset(src, info)
+            if 0 in shape:
+                # empty files cannot be mapped
+                arrays[name] = np.empty(shape, dtype=dtype)
+                continue
+            arrays[name] = np.memmap(
+                fname,
+                dtype=dtype,
+                mode="r",
+                offset=offset,
+                shape=shape,
+                order="F" if fortran else "C",
+            )
+    n_types = len(header["counts"])
+    pairs = [arrays[f"pairs{j}"] for j in range(n_types)]
+    finite = [arrays[f"finite{j}"] for j in range(n_types)]
+    return header, pairs, finite
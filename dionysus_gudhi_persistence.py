@@ -1,46 +1,106 @@
 import argparse
+import collections
+import itertools
+import mmap
 import os
 import re
 import subprocess
 import sys
+import threading
 import time
 
 import dionysus
 import numpy as np
 
+TSC_MAGIC = b"TTKSimplicialComplex"
+# magic, number of cells, dimension and number of cells per dimension
+TSC_HEADER_SIZE = 20 + 4 * 6
+# number of simplices inserted at once
+BLOCK_SIZE = 1 << 20
+
 
 def read_simplicial_complex(dataset):
+    """Number of cells per dimension, values and simplices (vertices of
+    the edges, triangles and tetrahedra) of a TTK Simplicial Complex
+    file, as read-only memory maps of the file (not parsed nor copied)"""
     start = time.time()
 
     with open(dataset, "rb") as src:
-        magic = src.read(20)
-        if magic != b"TTKSimplicialComplex":
-            print("Not a TTK Simplicial Complex file")
-            raise TypeError
+        header = src.read(TSC_HEADER_SIZE)
+    if len(header) != TSC_HEADER_SIZE or header[:20] != TSC_MAGIC:
+        print("Not a TTK Simplicial Complex file")
+        raise TypeError
+    ncells, dim, *dims = np.frombuffer(header[20:], dtype="<i4").tolist()
+
+    # values, number of entries in the boundary matrix, then the vertices
+    # of the edges, triangles and tetrahedra
+    layout = [("<f8", ncells), ("<i4", 1)]
+    layout += [("<i4", (k + 1) * dims[k]) for k in range(1, 4)]
+    size = TSC_HEADER_SIZE + sum(np.dtype(t).itemsize * n for t, n in layout)
+    if (
+        not 0 <= dim <= 3
+        or min(dims) < 0
+        or sum(dims) != ncells
+        or os.path.getsize(dataset) < size
+    ):
+        print("Corrupted TTK Simplicial Complex file")
+        raise TypeError
+    print(f"Number of cells: {ncells}")
+    print(f"Global dataset dimension: {dim}")
+    for i in range(dim + 1):
+        print(f"  {dims[i]} cells of dimension {i}")
+
+    arrays = []
+    offset = TSC_HEADER_SIZE
+    for dtype, count in layout:
+        if count == 0:
+            # empty files cannot be mapped
+            arrays.append(np.empty(0, dtype=dtype))
+        else:
+            arrays.append(
+                np.memmap(dataset, dtype=dtype, mode="r", offset=offset, shape=(count,))
+            )
+        offset += np.dtype(dtype).itemsize * count
+    values, num_entries, edges, triangles, tetras = arrays
+    print(f"Number of entries in boundary matrix: {int(num_entries[0])}")
 
-        ncells = int.from_bytes(src.read(4), "little", signed=True)
-        print(f"Number of cells: {ncells}")
+    print(f"Read TTK Simplicial Complex file: {time.time() - start:.3f}s")
+    return dims, values, (edges, triangles, tetras)
 
-        dim = int.from_bytes(src.read(4), "little", signed=True)
-        print(f"Global dataset dimension: {dim}")
 
-        dims = [0, 0, 0, 0]
-        for i, _ in enumerate(dims):
-            dims[i] = int.from_bytes(src.read(4), "little", signed=True)
-        for i in range(dim + 1):
-            print(f"  {dims[i]} cells of dimension {i}")
+def split_complex(dims, values, cpx):
+    """Simplices of every dimension k (arrays of shape (n, k + 1)) and
+    their values (views of the input arrays)"""
+    simplices = [np.arange(dims[0], dtype=np.int32).reshape(-1, 1)]
+    for k, arr in enumerate(cpx, start=1):
+        simplices.append(arr[: (k + 1) * dims[k]].reshape(-1, k + 1))
+    offsets = np.cumsum([0] + dims)
+    vals = [values[offsets[k] : offsets[k + 1]] for k in range(len(dims))]
+    return simplices, vals
 
-        values = np.fromfile(src, dtype=np.double, count=ncells)
 
-        num_entries = int.from_bytes(src.read(4), "little", signed=True)
-        print(f"Number of entries in boundary matrix: {num_entries}")
+def release_pages(arr):
+    """Drop the pages of a contiguous memory-mapped array from the
+    resident memory (file-backed pages count in the measured RSS until
+    released, they are read again from the file if needed)"""
+    mm = getattr(arr, "_mmap", None)
+    if mm is None or arr.size == 0 or not hasattr(mmap, "MADV_DONTNEED"):
+        return
+    start = arr.ctypes.data - np.frombuffer(mm, dtype=np.uint8).ctypes.data
+    beg = start - start % mmap.PAGESIZE
+    mm.madvise(mmap.MADV_DONTNEED, beg, start + arr.nbytes - beg)
 
-        edges = np.fromfile(src, dtype=np.int32, count=2 * dims[1])
-        triangles = np.fromfile(src, dtype=np.int32, count=3 * dims[2])
-        tetras = np.fromfile(src, dtype=np.int32, count=4 * dims[3])
 
-    print(f"Read TTK Simplicial Complex file: {time.time() - start:.3f}s")
-    return dims, values, (edges, triangles, tetras)
+def iter_simplices(simplices, vals, block_size=BLOCK_SIZE):
+    """Blocks of at most `block_size` simplices of every dimension (in
+    increasing dimensions) and their values, to stream the complex in
+    bounded memory: the pages of a block are released once consumed"""
+    for spl, val in zip(simplices, vals):
+        for beg in range(0, len(spl), block_size):
+            block = spl[beg : beg + block_size], val[beg : beg + block_size]
+            yield block
+            for arr in block:
+                release_pages(arr)
 
 
 class Ripser_SparseDM:
@@ -51,56 +111,71 @@ class Ripser_SparseDM:
         print("Using the Ripser backend")
 
     def fill_dist_mat(self, dims, vals, edges):
+        # vertices on the diagonal, edges above
         edges = edges.reshape(-1, 2)
-        I = np.zeros(dims[0] + dims[1], dtype=np.int32)
-        J = np.zeros(dims[0] + dims[1], dtype=np.int32)
-        V = np.zeros(dims[0] + dims[1], dtype=np.double)
+        diag = np.arange(dims[0], dtype=np.int32)
 
         if dims[2] != 0:
             self.maxdim = 1
         if dims[3] != 0:
             self.maxdim = 2
 
-        for i in range(dims[0]):
-            I[i] = i
-            J[i] = i
-            V[i] = vals[i]
-
-        for i, e in enumerate(edges):
-            o = dims[0] + i
-            I[o] = e[0]
-            J[o] = e[1]
-            V[o] = vals[dims[0] + i]
+        self.dist_mat = (
+            np.concatenate([diag, edges[:, 0]]),
+            np.concatenate([diag, edges[:, 1]]),
+            vals[: dims[0] + dims[1]],
+        )
 
-        with open("dist_mat", "w") as dst:
-            for i, j, v in zip(I, J, V):
-                dst.write(f"{i} {j} {v}\n")
+    def write_dist_mat(self, dst, block_size=1 << 20):
+        """Write the sparse distance matrix ("i j value" lines) by blocks
+        into a pipe. Every block is formatted by a single %-formatting,
+        without a Python loop per entry (%.17g round-trips the values)"""
+        I, J, V = self.dist_mat
+        try:
+            for beg in range(0, len(V), block_size):
+                sl = slice(beg, beg + block_size)
+                blk = zip(I[sl].tolist(), J[sl].tolist(), V[sl].tolist())
+                args = tuple(itertools.chain.from_iterable(blk))
+                dst.write("%d %d %.17g\n" * (len(args) // 3) % args)
+            dst.close()
+        except BrokenPipeError:
+            # Ripser exited early, reported by its return code
+            try:
+                dst.close()
+            except BrokenPipeError:
+                pass
 
     def compute_pers(self):
+        # the distance matrix is read on the standard input
         cmd = (
-            ["backends_src/ripser/ripser"]
+            [os.path.join(os.path.dirname(__file__), "backends_src/ripser/ripser")]
             + ["--format", "sparse"]
             + ["--dim", "2"]
-            + ["dist_mat"]
         )
+        pattern = re.compile(r"\[(\d+|\d+.\d+),(\d+|\d+.\d+)?\)")
         with subprocess.Popen(
             cmd,
+            stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             universal_newlines=True,
         ) as proc:
+            writer = threading.Thread(target=self.write_dist_mat, args=(proc.stdin,))
+            writer.start()
             self.diag = [[], [], []]
-            if proc.returncode != 0:
-                print(proc.stderr.read())
-                raise subprocess.CalledProcessError(proc.returncode, cmd)
-            for line in proc.stdout.readlines():
+            dim = 0
+            # intervals parsed as Ripser emits them
+            for line in proc.stdout:
                 if "intervals" in line:
                     dim = int(line.strip()[-2])
-                line = line.strip()
-                m = re.search(r"\[(\d+|\d+.\d+),(\d+|\d+.\d+)?\)", line)
+                m = pattern.search(line)
                 if m is not None:
                     self.diag[dim].append((m.groups()[0], m.groups()[1]))
-            os.remove("dist_mat")
+            writer.join()
+            proc.wait()
+            if proc.returncode != 0:
+                print(proc.stderr.read())
+                raise subprocess.CalledProcessError(proc.returncode, cmd)
 
     def write_diag(self, output):
         n_pairs = 0
@@ -123,6 +198,14 @@ class Dionysus_Filtration:
     def add(self, verts, val):
         self.f.append(dionysus.Simplex(verts, val))
 
+    def add_complex(self, simplices, vals):
+        # by blocks of simplices, faces first: the Simplex objects are
+        # built and appended by map (no Python loop per simplex), the
+        # filtration is sorted once in compute_pers
+        for spl, val in iter_simplices(simplices, vals):
+            block = map(dionysus.Simplex, spl.tolist(), val.tolist())
+            collections.deque(map(self.f.append, block), maxlen=0)
+
     def compute_pers(self):
         self.f.sort()
         m = dionysus.homology_persistence(self.f)
@@ -146,6 +229,17 @@ class Gudhi_SimplexTree:
     def add(self, verts, val):
         self.st.insert(verts, filtration=val)
 
+    def add_complex(self, simplices, vals):
+        if not hasattr(self.st, "insert_batch"):
+            # Gudhi < 3.6
+            for spl, val in zip(simplices, vals):
+                for verts, v in zip(spl.tolist(), val.tolist()):
+                    self.add(verts, v)
+            return
+        # by blocks of simplices, faces first
+        for spl, val in iter_simplices(simplices, vals):
+            self.st.insert_batch(spl.T, val)
+
     def compute_pers(self):
         self.pairs = self.st.persistence()
 
@@ -155,14 +249,17 @@ class Gudhi_SimplexTree:
                 dst.write(f"{dim} {birth:.3f} {death:.3f}\n")
 
 
-def compute_persistence(wrapper, dims, values, cpx, output):
+def compute_persistence(wrapper, dims, values, cpx, output, batch=True):
     start = time.time()
 
     edges, triangles, tetras = cpx
 
     if isinstance(wrapper, Ripser_SparseDM):
         wrapper.fill_dist_mat(dims, values, edges)
+    elif batch:
+        wrapper.add_complex(*split_complex(dims, values, cpx))
     else:
+        # reference path: one call per simplex
         for i in range(dims[0]):
             wrapper.add([i], values[i])
         for i in range(dims[1]):
@@ -192,7 +289,7 @@ def compute_persistence(wrapper, dims, values, cpx, output):
     return (prec, pers)
 
 
-def run(dataset, output, backend="Gudhi", simplicial=True):
+def run(dataset, output, backend="Gudhi", simplicial=True, batch=True):
     if simplicial:
         dims, vals, cpx = read_simplicial_complex(dataset)
         dispatch = {
@@ -200,7 +297,7 @@ def run(dataset, output, backend="Gudhi", simplicial=True):
             "Gudhi": Gudhi_SimplexTree,
             "Ripser": Ripser_SparseDM,
         }
-        return compute_persistence(dispatch[backend](), dims, vals, cpx, output)
+        return compute_persistence(dispatch[backend](), dims, vals, cpx, output, batch)
 
     if backend == "Gudhi":
         print("Use the Gudhi Cubical Complex backend")
@@ -257,6 +354,11 @@ def main():
     parser.add_argument(
         "-b", choices=["gudhi", "dionysus", "ripser"], default="gudhi", dest="backend"
     )
+    parser.add_argument(
+        "--per_simplex",
+        action="store_true",
+        help="Insert the simplices one by one (reference, slower)",
+    )
     args = parser.parse_args()
 
     ext = args.input_dataset.split(".")[-1]
@@ -280,6 +382,7 @@ def main():
         args.output_diagram,
         backend=args.backend.capitalize(),
         simplicial="expl" in args.input_dataset or "tsc" in args.input_dataset,
+        batch=not args.per_simplex,
     )
 
 
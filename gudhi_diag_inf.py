@@ -1,40 +1,115 @@
+import multiprocessing
+import os
 import pathlib
 import re
+import shutil
+import tempfile
 
+import diagram_store
+import history
 
-def replace_inf(diag):
-    with open(diag, "r") as src:
-        pairs = src.read()
-    patt = re.compile(r".*_(\d+)x(\d+)x(\d+)_.*")
-    dims = re.match(patt, diag.stem).groups()
-    dims = [int(d) for d in dims]
-    max_order = dims[0] * dims[1] * dims[2] - 1
-    out_pairs = list()
-    found = False
-    for line in pairs.split("\n"):
-        line = line.lower()
-        if "inf" in line:
-            line = line.replace("inf", str(max_order))
-            found = True
-        out_pairs.append(line)
-    if not found:
-        # skip rewrite part if no "inf" in file
-        return found
-    with open(diag, "w") as dst:
-        dst.write("\n".join(out_pairs))
-    return found
-
-
-def main():
-    """Read a Persistence Diagram in the Gudhi format and replace the
-    "inf" value with the maximum order extracted from the dataset
-    dimensions from the diagram file name.
+# size of the blocks of the diagrams read at once
+CHUNK_SIZE = 1 << 24
+
+
+def copy_head(diag, dst, size):
+    """Copy the first bytes of a file into an open file"""
+    with open(diag, "rb") as src:
+        while size > 0:
+            buf = src.read(min(CHUNK_SIZE, size))
+            if not buf:
+                break
+            dst.write(buf)
+            size -= len(buf)
+
+
+def diagram_dataset(diag):
+    """Name of the dataset of a diagram ("foo_10x10x10_order_expl" for
+    "diagrams/foo_10x10x10_order_expl_Gudhi.gudhi")"""
+    stem = pathlib.Path(diag).stem
+    match = re.match(r".*_\d+x\d+x\d+_[^_-]+_(expl|impl)", stem)
+    return stem if match is None else match.group(0)
+
+
+def replace_inf(diag, dataset=None):
+    """Replace the "inf" deaths of a diagram in the Gudhi format with the
+    maximum vertex order of its dataset (by default, the dataset whose
+    name starts the diagram file name). The number of vertices comes
+    from the binary store of the diagram or from the dataset file (see
+    history.dataset_vertices), the extent in the dataset name being only
+    a fallback.
+
+    The diagram is streamed by blocks of lines (bounded memory) and is
+    re-written atomically, only if it has infinite deaths. Returns
+    whether infinite deaths were found.
+    """
+    diag = str(diag)
+    store = diagram_store.find(diag)
+    header = None if store is None else diagram_store.read_header(store)
+    if header is not None and header["#Infinite"] == 0:
+        # no need to read the diagram
+        return False
+    if header is not None and header["#Vertices"] > 0:
+        n_verts = header["#Vertices"]
+    else:
+        n_verts = history.dataset_vertices(dataset or diagram_dataset(diag))
+    if n_verts == 0:
+        print(f"Unknown dataset dimensions, skipping {diag}")
+        return False
+    max_order = str(n_verts - 1).encode()
+
+    tmp = None
+    dst = None
+    try:
+        with open(diag, "rb") as src:
+            offset = 0
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                # complete the last line of the block
+                chunk += src.readline()
+                low = chunk.lower()
+                if dst is None and b"inf" in low:
+                    # first infinite death: the lines before are kept (in a
+                    # unique file, concurrent passes may rewrite the diagram)
+                    fd, tmp = tempfile.mkstemp(
+                        dir=os.path.dirname(diag) or ".", suffix=".part"
+                    )
+                    dst = os.fdopen(fd, "wb")
+                    copy_head(diag, dst, offset)
+                if dst is not None:
+                    dst.write(low.replace(b"inf", max_order))
+                offset += len(chunk)
+        if dst is None:
+            # skip rewrite part if no "inf" in file
+            return False
+        dst.close()
+        shutil.copymode(diag, tmp)
+        os.replace(tmp, diag)
+    finally:
+        if dst is not None and not dst.closed:
+            dst.close()
+        if tmp is not None and os.path.exists(tmp):
+            os.remove(tmp)
+    if store is not None:
+        # infinite deaths were already resolved the same way in the store
+        os.utime(store)
+    return True
+
+
+def main(processes=None):
+    """Read the Persistence Diagrams in the Gudhi format of the diagrams/
+    directory and replace the "inf" values with the maximum order of
+    their dataset, in a pool of processes.
     """
-    p = pathlib.Path("diagrams")
-    for diag in sorted(p.glob("*.gudhi")):
-        found = replace_inf(diag)
-        if found:
-            print(f"Post-processed {diag}")
+    diags = sorted(str(d) for d in pathlib.Path("diagrams").glob("*.gudhi"))
+    if not diags:
+        return
+    with multiprocessing.Pool(processes) as pool:
+        for diag, found in zip(diags, pool.imap(replace_inf, diags)):
+            if found:
+                print(f"Post-processed {diag}")
 
 
 if __name__ == "__main__":
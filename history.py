@@ -0,0 +1,171 @@
+import json
+import logging
+import math
+import os
+import re
+import struct
+
+
+def dataset_size(dsname):
+    """Number of vertices and number of cells of a dataset, computed
+    from the extent in its name (e.g. "foo_192x192x192_order_expl").
+
+    Explicit datasets are grids tetrahedralized with 5 tetrahedra per
+    voxel (vtkTetrahedralize), implicit datasets are cubical complexes.
+    """
+    ext = re.search(r"_(\d+)x(\d+)x(\d+)_", dsname)
+    if ext is None:
+        return 0, 0
+    dims = [int(d) for d in ext.groups()]
+    n_verts = dims[0] * dims[1] * dims[2]
+    dims = [d for d in dims if d > 1]
+
+    if "impl" in dsname:
+        # cubical complex: every vertex, edge, square and cube
+        n_cells = 1
+        for d in dims:
+            n_cells *= 2 * d - 1
+        return n_verts, n_cells
+
+    # vertices, edges, triangles and tetrahedra of the triangulated grid
+    if len(dims) == 1:
+        return n_verts, n_verts + dims[0] - 1
+    if len(dims) == 2:
+        a, b = dims
+        n_squares = (a - 1) * (b - 1)
+        n_edges = (a - 1) * b + a * (b - 1) + n_squares
+        return n_verts, n_verts + n_edges + 2 * n_squares
+    a, b, c = dims
+    n_voxels = (a - 1) * (b - 1) * (c - 1)
+    n_axis_edges = (a - 1) * b * c + a * (b - 1) * c + a * b * (c - 1)
+    n_squares = (a - 1) * (b - 1) * c + (a - 1) * b * (c - 1) + a * (b - 1) * (c - 1)
+    n_edges = n_axis_edges + n_squares  # one diagonal per square
+    n_triangles = 2 * n_squares + 4 * n_voxels
+    n_tetras = 5 * n_voxels
+    return n_verts, n_verts + n_edges + n_triangles + n_tetras
+
+
+def dataset_vertices(dsname, datasets_dir="datasets"):
+    """Number of vertices of a dataset, read in the header of its TTK
+    Simplicial Complex (.tsc) or Perseus cubical grid (.pers) file. The
+    extent in the dataset name (see dataset_size) is only a fallback,
+    for datasets without such a file."""
+    tsc = os.path.join(datasets_dir, f"{dsname}.tsc")
+    pers = os.path.join(datasets_dir, f"{dsname}.pers")
+    try:
+        if os.path.isfile(tsc):
+            with open(tsc, "rb") as src:
+                # magic, number of cells, dimension, cells per dimension
+                header = src.read(20 + 4 * 6)
+            if header.startswith(b"TTKSimplicialComplex") and len(header) == 44:
+                return struct.unpack("<i", header[28:32])[0]
+        if "impl" in dsname and os.path.isfile(pers):
+            with open(pers) as src:
+                # dimension, then the extent along every axis
+                dim = int(src.readline())
+                n_verts = 1
+                for _ in range(dim):
+                    n_verts *= int(src.readline())
+            return n_verts
+    except (OSError, ValueError):
+        pass
+    return dataset_size(dsname)[0]
+
+
+def load_results(fnames):
+    """Merge several results files into one table"""
+    times = {}
+    for fname in fnames:
+        try:
+            with open(fname) as src:
+                res = json.load(src)
+        except (OSError, json.JSONDecodeError):
+            logging.warning("Could not read results from %s", fname)
+            continue
+        for dsname, backends in res.items():
+            for backend, perfs in backends.items():
+                if isinstance(perfs, dict):
+                    times.setdefault(dsname, {}).setdefault(backend, {}).update(perfs)
+    return times
+
+
+def get_samples(times, backend, field, mode=None, like=None):
+    """List of (number of cells, value) of the given field (or sum of a
+    list of fields) measured for a backend (results key), restricted to
+    a run mode and to datasets of the same complex type
+    (implicit/explicit) as `like` if given"""
+    fields = [field] if isinstance(field, str) else field
+    samples = []
+    for dsname, backends in times.items():
+        if like is not None and like.split("_")[-1] != dsname.split("_")[-1]:
+            continue
+        perfs = backends.get(backend)
+        if not isinstance(perfs, dict):
+            continue
+        _, n_cells = dataset_size(dsname)
+        if n_cells == 0:
+            continue
+        for m, res in perfs.items():
+            if mode is not None and m != mode:
+                continue
+            if not isinstance(res, dict) or any(f not in res for f in fields):
+                continue
+            val = sum(float(res[f]) for f in fields)
+            if val > 0.0:
+                samples.append((n_cells, val))
+    return samples
+
+
+def timeout_sizes(times, backend, min_timeout, like=None):
+    """Number of cells of the datasets on which a backend (timeout key)
+    reached a timeout of at least `min_timeout` seconds"""
+    sizes = []
+    for dsname, backends in times.items():
+        if like is not None and like.split("_")[-1] != dsname.split("_")[-1]:
+            continue
+        perfs = backends.get(backend)
+        if not isinstance(perfs, dict):
+            continue
+        timeout = perfs.get("timeout")
+        # predicted timeouts are not measurements
+        if isinstance(timeout, (int, float)) and timeout >= min_timeout:
+            sizes.append(dataset_size(dsname)[1])
+    return [s for s in sizes if s > 0]
+
+
+def fit_power_law(samples):
+    """Least-squares fit of y = c * x^k in log-log scale. The exponent
+    defaults to 1 (linear scaling) if there are less than two different
+    sizes in the samples.
+
+    Returns (c, k)
+    """
+    samples = [(x, y) for x, y in samples if x > 0 and y > 0]
+    if not samples:
+        return None
+    lx = [math.log(x) for x, _ in samples]
+    ly = [math.log(y) for _, y in samples]
+    mx = sum(lx) / len(lx)
+    my = sum(ly) / len(ly)
+    var = sum((a - mx) ** 2 for a in lx)
+    if var == 0.0:
+        k = 1.0
+    else:
+        k = sum((a - mx) * (b - my) for a, b in zip(lx, ly)) / var
+    return math.exp(my - k * mx), k
+
+
+def predict(samples, size, envelope=True):
+    """Extrapolate a value (time, memory) at the given size from the
+    measured samples. With `envelope`, the fitted curve is scaled up so
+    that every sample lies below it (conservative prediction).
+
+    Returns None without samples.
+    """
+    fit = fit_power_law(samples)
+    if fit is None:
+        return None
+    c, k = fit
+    if envelope:
+        c = max(y / x**k for x, y in samples if x > 0 and y > 0)
+    return c * size**k
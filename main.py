@@ -3,6 +3,7 @@
 import argparse
 import datetime
 import enum
+import functools
 import glob
 import json
 import logging
@@ -10,12 +11,28 @@ import multiprocessing
 import os
 import pathlib
 import re
+import shutil
+import socket
 import subprocess
 import sys
+import tempfile
+import threading
+import time
 
+import diagram_store
 import download_datasets
 import gudhi_diag_inf
+import history
 import pers2gudhi
+import phat2gudhi
+import placement
+import process_runner
+import result_cache
+import robust_stats
+import run_journal
+import scheduler
+import warm_worker
+import work_queue
 
 logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s", level=logging.INFO)
 
@@ -60,7 +77,7 @@ def prepare_datasets(args):
                 rs = args.max_resample_size
             p = multiprocessing.Process(
                 target=convert_datasets.main,
-                args=(dataset, "datasets", rs, SliceType.VOL),
+                args=(dataset, "datasets", rs, SliceType.VOL, args.phat_ascii),
             )
             p.start()
             p.join()
@@ -72,7 +89,7 @@ def prepare_datasets(args):
                 rs = args.max_resample_size
             p = multiprocessing.Process(
                 target=convert_datasets.main,
-                args=(dataset, "datasets", rs, SliceType.SURF),
+                args=(dataset, "datasets", rs, SliceType.SURF, args.phat_ascii),
             )
             p.start()
             p.join()
@@ -84,15 +101,19 @@ def prepare_datasets(args):
                 rs = args.max_resample_size
             p = multiprocessing.Process(
                 target=convert_datasets.main,
-                args=(dataset, "datasets", rs, SliceType.LINE),
+                args=(dataset, "datasets", rs, SliceType.LINE, args.phat_ascii),
             )
             p.start()
             p.join()
 
 
-def get_pairs_number(diag):
-    import compare_diags
+def get_pairs_number(diag, dataset=None, backend=None):
+    """Number of pairs per type of a diagram, converted into its binary
+    store (read by the later stages instead of the diagram file).
 
+    The infinite deaths of the diagrams in the Gudhi format are first
+    replaced with the maximum order of the dataset.
+    """
     default = {
         "#Min-saddle": 0,
         "#Saddle-saddle": 0,
@@ -101,26 +122,17 @@ def get_pairs_number(diag):
     }
 
     try:
-        pairs = compare_diags.read_diag(diag)
-    except AttributeError:
+        if diag.endswith(".gudhi"):
+            gudhi_diag_inf.replace_inf(diag, dataset)
+        header = diagram_store.convert(
+            diag, dataset, None if backend is None else backend.value
+        )
+    except (OSError, ValueError, AttributeError, TypeError):
+        # no diagram (or not readable, or missing arrays)
         return default
-    if len(pairs) == 0:
+    if len(header["counts"]) == 0:
         return default
-
-    if "x1_" in diag:
-        # 2D
-        return {
-            "#Min-saddle": len(pairs[0]),
-            "#Saddle-max": len(pairs[1]),
-            "#Total pairs": sum([len(p) for p in pairs]),
-        }
-    # 3D
-    return {
-        "#Min-saddle": len(pairs[0]),
-        "#Saddle-saddle": len(pairs[1]),
-        "#Saddle-max": len(pairs[2]),
-        "#Total pairs": sum([len(p) for p in pairs]),
-    }
+    return diagram_store.pair_counts(header, diag)
 
 
 def escape_ansi_chars(txt):
@@ -134,8 +146,42 @@ def dataset_name(dsfile):
 
 
 TIMEOUT_S = 1800  # 30 min
+TIMEOUT_POLICY = "fixed"  # runs predicted to time out: "fixed", "skip", "shorten"
+SHORT_TIMEOUT_RATIO = 0.1  # timeout ratio of the runs predicted to time out
 SEQUENTIAL = False  # parallel
+THREADS = None  # thread numbers of a thread-scaling sweep
 RESUME = False  # compute every diagram
+RESUME_CELLS = None  # (dataset, backend, mode) runs found in a resumed journal
+JOURNAL = None  # journal of the completed runs
+MEM_BUDGET_MB = None  # no memory admission control
+HISTORY = {}  # results of previous campaigns (memory & time predictions)
+SAMPLING_RATE = 10.0  # resources sampling rate of the process tree (Hz)
+REPEAT = 1  # number of measured runs per backend and dataset
+WARMUP = 0  # number of discarded runs before the measured ones
+CACHE = None  # no result cache
+SCRATCH_DIR = None  # parent of the per-run scratch directories (system default)
+PLACEMENT = placement.Placement.NONE  # no process pinning
+PLACEMENT_CPUS = None  # ordered CPUs used by the placement policy
+MAX_THREADS = None  # threads of the parallel runs (default: CPUs of this machine)
+PERF_COUNTERS = False  # no hardware performance counters
+PYTHON_STARTUP = "cold"  # Python backends started for every run
+WARM_POOL = None  # warm workers of the Python backends (steady state)
+# modules imported once by the warm workers of the Python backends, and
+# directories of the modules built in build_dirs
+PYTHON_MODULES = {
+    "dionysus_gudhi_persistence.py": (
+        ["numpy", "dionysus", "gudhi"],
+        ["build_dirs/gudhi/src/python"],
+    ),
+    "oineus_persistence.py": (
+        ["numpy", "oineus"],
+        ["build_dirs/oineus/bindings/python"],
+    ),
+    "phat2gudhi.py": (["numpy"], []),
+}
+# description of the run in progress in the current thread (cores
+# reserved by the concurrent scheduler, resources trace file)
+CURRENT_RUN = threading.local()
 
 
 def get_time_mem(txt):
@@ -149,33 +195,217 @@ def get_time_mem(txt):
         return 0.0, 0.0
 
 
-def launch_process(cmd, *args, **kwargs):
-    RES_MEAS = [
-        "/usr/bin/python3",
-        "subprocess_wrapper.py",
-        "--",
-        "/usr/bin/timeout",
-        "--preserve-status",
-        str(TIMEOUT_S),
-    ]
+def get_mem_profile(txt):
+    """Mean memory (MB) and time to memory peak (s) sampled by
+    subprocess_wrapper.py"""
+    res = {}
+    pats = {
+        "mem_mean": r"^Mean Memory \(kB\): (\d+\.\d+|\d+)$",
+        "mem_peak_time": r"^Time to Peak Memory \(s\): (\d+\.\d+|\d+)$",
+    }
+    for key, pat in pats.items():
+        match = re.search(pat, txt, re.MULTILINE)
+        if match is not None:
+            res[key] = float(match.group(1))
+    if "mem_mean" in res:
+        res["mem_mean"] = round(res["mem_mean"] / 1000)
+    return res
+
+
+def get_startup(txt):
+    """Start-up time (s) and memory (MB) of the warm worker that ran a
+    Python backend (excluded from the run measures)"""
+    pats = {
+        "time": r"^Startup Time \(s\): (\d+\.\d+|\d+)$",
+        "mem": r"^Startup Memory \(MB\): (\d+\.\d+|\d+)$",
+    }
+    res = {}
+    for key, pat in pats.items():
+        match = re.search(pat, txt, re.MULTILINE)
+        if match is not None:
+            res[key] = float(match.group(1))
+    if not res:
+        return {}
+    return {"startup": {"mode": "steady", **res}}
+
+
+def get_perf_counters(txt):
+    """Hardware performance counters (cycles, instructions, IPC, LLC
+    misses, branch misses) and context switches counted by
+    subprocess_wrapper.py --perf"""
+    keys = {
+        "Cycles": "cycles",
+        "Instructions": "instructions",
+        "IPC": "ipc",
+        "LLC Misses": "llc_misses",
+        "Branch Misses": "branch_misses",
+        "Context Switches": "context_switches",
+    }
+    counters = {}
+    for name, key in keys.items():
+        match = re.search(rf"^Perf {name}: (\d+\.\d+|\d+)$", txt, re.MULTILINE)
+        if match is not None:
+            val = float(match.group(1))
+            counters[key] = val if key == "ipc" else int(val)
+    if not counters:
+        return {}
+    return {"perf": counters}
+
+
+def scratch_file(path):
+    """Path of a file in the scratch directory of the current run"""
+    scratch = getattr(CURRENT_RUN, "scratch", None)
+    if scratch is None:
+        return path
+    return os.path.join(scratch, os.path.basename(path))
+
+
+def publish(path):
+    """Move a file from the scratch directory of the current run to its
+    final location. The file is first moved next to its destination
+    (the scratch directory may be on another filesystem), then renamed
+    over it, so that the destination is never partially written."""
+    src = scratch_file(path)
+    if src == path or not os.path.exists(src):
+        return
+    # unique name: concurrent runs may publish to the same destination
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".part")
+    os.close(fd)
+    try:
+        shutil.move(src, tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def launch_process(cmd, **kwargs):
+    # backends run in the scratch directory of the current run
+    kwargs.setdefault("cwd", getattr(CURRENT_RUN, "scratch", None))
+    RES_MEAS = ["/usr/bin/python3", os.path.abspath("subprocess_wrapper.py")]
+    RES_MEAS += ["--rate", str(SAMPLING_RATE)]
+    if PERF_COUNTERS:
+        RES_MEAS += ["--perf"]
+    cores = getattr(CURRENT_RUN, "cores", None)
+    if cores is not None:
+        # pin the backend on the cores reserved by the scheduler
+        RES_MEAS += ["--cpus", ",".join(str(c) for c in cores)]
+        # bind the OpenMP threads
+        if PLACEMENT != placement.Placement.NONE:
+            env = dict(kwargs.get("env", os.environ))
+            env.update(PLACEMENT.omp_env(cores))
+            kwargs["env"] = env
+    trace = getattr(CURRENT_RUN, "trace", None)
+    if trace is not None:
+        # resources time series, next to the logs
+        RES_MEAS += ["--trace", os.path.abspath(trace)]
+    timeout = getattr(CURRENT_RUN, "timeout", TIMEOUT_S)
+    RES_MEAS += ["--", "/usr/bin/timeout", "--preserve-status", str(timeout)]
     cmd = RES_MEAS + cmd
-    with subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        universal_newlines=True,
-        *args,
-        **kwargs,
-    ) as proc:
+    # stdout & stderr are drained while the backend runs (a full pipe
+    # would stall it), into log files if the run has a log prefix
+    supervisor = process_runner.get_supervisor()
+    log = getattr(CURRENT_RUN, "log", None)
+    try:
+        if log is None:
+            return supervisor.run(cmd, timeout, **kwargs)
+        with open(f"{log}.out", "ab") as out, open(f"{log}.err", "ab") as err:
+            return supervisor.run(cmd, timeout, (out, err), **kwargs)
+    except subprocess.CalledProcessError as cpe:
+        logging.debug(cpe.stderr)
+        raise
+
+
+def launch_python(cmd):
+    """Run a Python backend script (`cmd` is [interpreter, script,
+    arguments...]) in a new interpreter (cold start) or in a warm worker
+    that has already imported its libraries (steady state)"""
+    if PYTHON_STARTUP == "cold":
+        return launch_process(cmd)
+
+    script, argv = cmd[1], cmd[2:]
+    preload, paths = PYTHON_MODULES.get(os.path.basename(script), ([], []))
+    paths = [os.path.abspath(p) for p in paths]
+    worker, started = WARM_POOL.acquire(script, preload, paths)
+    if started:
+        logging.info(
+            "  Started a warm worker for %s in %.3fs",
+            os.path.basename(script),
+            worker.startup["time"],
+        )
+    timeout = getattr(CURRENT_RUN, "timeout", TIMEOUT_S)
+    trace = getattr(CURRENT_RUN, "trace", None)
+    with tempfile.TemporaryDirectory(prefix="warm.") as tmp:
+        try:
+            code, stats = worker.run(
+                argv,
+                timeout,
+                f"{tmp}/out",
+                f"{tmp}/err",
+                cwd=getattr(CURRENT_RUN, "scratch", None),
+                cpus=getattr(CURRENT_RUN, "cores", None),
+                trace=None if trace is None else os.path.abspath(trace),
+                rate=SAMPLING_RATE,
+            )
+        finally:
+            outputs = []
+            for ext in ["out", "err"]:
+                path = pathlib.Path(f"{tmp}/{ext}")
+                outputs.append(path.read_bytes() if path.exists() else b"")
+            log = getattr(CURRENT_RUN, "log", None)
+            if log is not None:
+                for ext, content in zip(["out", "err"], outputs):
+                    with open(f"{log}.{ext}", "ab") as dst:
+                        dst.write(content)
+    WARM_POOL.release(worker)
+
+    out, err = [process_runner.decode([o]) for o in outputs]
+    if code != 0:
+        logging.debug(err)
+        raise subprocess.CalledProcessError(code, cmd, out, err)
+    # same statistics as subprocess_wrapper.py
+    err += "".join(f"{key}: {val}\n" for key, val in stats.items())
+    err += f"Startup Time (s): {worker.startup['time']}\n"
+    err += f"Startup Memory (MB): {worker.startup['mem']}\n"
+    return out, err
+
+
+def closes_warm_pool(func):
+    """Stop the idle warm workers of the Python backends (each in its own
+    session, libraries loaded) when a campaign ends, even on error"""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
         try:
-            proc.wait(TIMEOUT_S)
-            if proc.returncode != 0:
-                logging.debug(proc.stderr.read())
-                raise subprocess.CalledProcessError(proc.returncode, cmd)
-            return (proc.stdout.read(), proc.stderr.read())
-        except subprocess.TimeoutExpired as te:
-            proc.terminate()
-            raise te
+            return func(*args, **kwargs)
+        finally:
+            global WARM_POOL  # pylint: disable=W0603
+            if WARM_POOL is not None:
+                WARM_POOL.close()
+                WARM_POOL = None
+
+    return wrapper
+
+
+def max_threads():
+    """Number of threads of the parallel runs"""
+    if MAX_THREADS is not None:
+        # cores of the compute nodes of a planned campaign
+        return MAX_THREADS
+    if PLACEMENT_CPUS is not None:
+        return len(PLACEMENT_CPUS)
+    return multiprocessing.cpu_count()
+
+
+def run_mode(num_threads):
+    """Key of a run with the given number of threads in the results
+    table ("seq", "para" or e.g. "8T" for the intermediate points of a
+    thread-scaling sweep)"""
+    if num_threads == 1:
+        return "seq"
+    if THREADS is None or num_threads == max(THREADS):
+        return "para"
+    return f"{num_threads}T"
 
 
 def store_log(log, ds_name, app, nthreads=None):
@@ -228,6 +458,101 @@ class SoftBackend(enum.Enum):
         }
         return dispatcher[self]
 
+    def is_multithreaded(self):
+        """If the number of threads (or of MPI processes) is configurable"""
+        if self == SoftBackend.DIPHA_MPI:
+            return True
+        return getattr(self.get_compute_function(), "multithreaded", False)
+
+    def get_thread_numbers(self):
+        """Number of threads of every run to perform with this backend"""
+        if self.is_multithreaded():
+            if THREADS is not None:
+                # thread-scaling sweep (the 1-process Dipha_MPI run is
+                # the sequential Dipha run)
+                return [
+                    n
+                    for n in sorted(THREADS, reverse=True)
+                    if n > 1 or self != SoftBackend.DIPHA_MPI
+                ]
+            if self == SoftBackend.DIPHA_MPI:
+                return [max_threads()]
+            if SEQUENTIAL:
+                return [1]
+            return sorted({max_threads(), 1}, reverse=True)
+        if self in [SoftBackend.GUDHI, SoftBackend.JAVAPLEX]:
+            # multi-threaded, not configurable
+            return [max_threads()]
+        return [1]
+
+    def get_diagram_file(self, dataset):
+        """Path to the diagram computed by this backend on a dataset"""
+        if self in [SoftBackend.TTK_FTM, SoftBackend.DISCRETE_MORSE_SANDWICH]:
+            return f"diagrams/{dataset}_{self.value.replace('/', '-')}.vtu"
+        if self in [SoftBackend.DIPHA, SoftBackend.DIPHA_MPI]:
+            return f"diagrams/{dataset}_{self.value.split('_')[0]}.dipha"
+        if self == SoftBackend.CUBICALRIPSER:
+            return f"diagrams/{dataset}_{self.value}.dipha"
+        if self in [SoftBackend.PERSEUS_CUB, SoftBackend.PERSEUS_SIM]:
+            return f"diagrams/{dataset}-{self.value}.gudhi"
+        return f"diagrams/{dataset}_{self.value}.gudhi"
+
+    def get_executables(self):
+        """Files whose modification should invalidate the cached results
+        of this backend"""
+        executables = {
+            SoftBackend.TTK_FTM: [
+                "build_dirs/install_paraview_v5.10.1/bin/ttkPersistenceDiagramCmd"
+            ],
+            SoftBackend.DIPHA: ["build_dirs/dipha/dipha"],
+            SoftBackend.CUBICALRIPSER: [
+                "backends_src/CubicalRipser_2dim/CR2",
+                "backends_src/CubicalRipser_3dim/CR3",
+            ],
+            SoftBackend.GUDHI: ["dionysus_gudhi_persistence.py"],
+            SoftBackend.RIPSER: [
+                "dionysus_gudhi_persistence.py",
+                "backends_src/ripser/ripser",
+            ],
+            SoftBackend.OINEUS: [
+                "oineus_persistence.py",
+                "build_dirs/oineus/oineus_filtration",
+            ],
+            SoftBackend.DIAMORSE: ["backends_src/diamorse/python/persistence.py"],
+            SoftBackend.PERSEUS_CUB: ["backends_src/perseus/perseus"],
+            SoftBackend.EIRENE: ["call_eirene.jl"],
+            SoftBackend.JAVAPLEX: [
+                "backends_src/javaplex.jar",
+                "jplex_persistence.class",
+            ],
+            SoftBackend.PHAT_SPECTR_SEQ: ["phat2gudhi.py", "build_dirs/phat/phat"],
+            SoftBackend.PERSCYCL: ["persistentCycles.py"],
+        }
+        executables[SoftBackend.DISCRETE_MORSE_SANDWICH] = executables[
+            SoftBackend.TTK_FTM
+        ]
+        executables[SoftBackend.DIPHA_MPI] = executables[SoftBackend.DIPHA]
+        executables[SoftBackend.DIONYSUS] = executables[SoftBackend.GUDHI]
+        executables[SoftBackend.PERSEUS_SIM] = executables[SoftBackend.PERSEUS_CUB]
+        executables[SoftBackend.PHAT_CHUNK] = executables[SoftBackend.PHAT_SPECTR_SEQ]
+        return executables[self] + ["subprocess_wrapper.py"]
+
+    def get_result_key(self):
+        """Key of this backend in the results table"""
+        if self in [
+            SoftBackend.DIPHA_MPI,
+            SoftBackend.PERSEUS_CUB,
+            SoftBackend.PERSEUS_SIM,
+        ]:
+            return self.value.split("_")[0]
+        return self.value
+
+    def get_timeout_key(self):
+        """Key of this backend in the results table for timeouts"""
+        if "Perseus" in self.value:
+            return "Perseus"
+        return self.value.replace("_", "/")
+
 
 class FileType(enum.Enum):
     VTI = enum.auto()
@@ -239,7 +564,7 @@ class FileType(enum.Enum):
     TSC = enum.auto()
     NETCDF = enum.auto()
     EIRENE_CSV = enum.auto()
-    PHAT_ASCII = enum.auto()
+    PHAT = enum.auto()
     OIN = enum.auto()
     UNDEFINED = enum.auto()
 
@@ -270,7 +595,7 @@ class FileType(enum.Enum):
         if ext == "eirene":
             return cls.EIRENE_CSV
         if ext == "phat":
-            return cls.PHAT_ASCII
+            return cls.PHAT
         if ext == "oin":
             return cls.OIN
 
@@ -313,7 +638,7 @@ class FileType(enum.Enum):
             return [SoftBackend.DIAMORSE]
         if self == FileType.EIRENE_CSV:
             return [SoftBackend.EIRENE]
-        if self == FileType.PHAT_ASCII:
+        if self == FileType.PHAT:
             return [SoftBackend.PHAT_SPECTR_SEQ, SoftBackend.PHAT_CHUNK]
         if self == FileType.OIN:
             return [SoftBackend.OINEUS_SIMPL]
@@ -336,26 +661,25 @@ class Complex(enum.Enum):
 
 
 def parallel_decorator(func):
-    def wrapper(*args, **kwargs):
-        if not SEQUENTIAL:
-            nt = multiprocessing.cpu_count()
-            logging.info("  Parallel implementation (%s threads)", nt)
-            el = func(*args, **kwargs, num_threads=nt)
-            logging.info("  Done in %.3fs", el)
-        logging.info("  Sequential implementation")
-        return func(*args, **kwargs, num_threads=1)
-
-    return wrapper
+    """Mark compute functions accepting a `num_threads` parameter (run
+    once in parallel and once sequentially, see
+    `SoftBackend.get_thread_numbers`)"""
+    func.multithreaded = True
+    return func
 
 
 @parallel_decorator
 def compute_ttk(fname, times, backend, num_threads=1):
     dataset = dataset_name(fname)
     bs = backend.value.replace("/", "-")
-    outp = f"diagrams/{dataset}_{bs}.vtu"
+    outp = scratch_file(backend.get_diagram_file(dataset))
     cmd = (
-        ["build_dirs/install_paraview_v5.10.1/bin/ttkPersistenceDiagramCmd"]
-        + ["-i", fname]
+        [
+            os.path.abspath(
+                "build_dirs/install_paraview_v5.10.1/bin/ttkPersistenceDiagramCmd"
+            )
+        ]
+        + ["-i", os.path.abspath(fname)]
         + ["-d", "4"]
         + ["-a", "ImageFile_Order"]
         + ["-t", str(num_threads)]
@@ -399,32 +723,36 @@ def compute_ttk(fname, times, backend, num_threads=1):
         "mem": mem,
         "#threads": num_threads,
     }
-    os.rename("output_port_0.vtu", outp)
-    res.update(get_pairs_number(outp))
-    times[dataset].setdefault(backend.value, {}).update(
-        {("seq" if num_threads == 1 else "para"): res}
-    )
+    os.rename(scratch_file("output_port_0.vtu"), outp)
+    res.update(get_mem_profile(err))
+    res.update(get_perf_counters(err))
+    res.update(get_pairs_number(outp, dataset, backend))
+    times[dataset].setdefault(backend.value, {}).update({run_mode(num_threads): res})
 
     store_log(out, dataset, bs, num_threads)
-
-    try:
-        os.remove("morse.dipha")
-        os.remove("output.dipha")
-    except FileNotFoundError:
-        pass
+    # morse.dipha and output.dipha are left in the scratch directory
 
     return elapsed
 
 
-def compute_dipha(fname, times, backend):
+def compute_dipha(fname, times, backend, num_threads=1):
     dataset = dataset_name(fname)
     b = backend.value.split("_")[0]
-    outp = f"diagrams/{dataset}_{b}.dipha"
-    cmd = ["build_dirs/dipha/dipha", "--benchmark", fname, outp]
-    num_threads = 1
+    outp = scratch_file(backend.get_diagram_file(dataset))
+    cmd = [
+        os.path.abspath("build_dirs/dipha/dipha"),
+        "--benchmark",
+        os.path.abspath(fname),
+        outp,
+    ]
     if backend is SoftBackend.DIPHA_MPI:
-        num_threads = multiprocessing.cpu_count()
-        cmd = ["mpirun", "--use-hwthread-cpus", "-np", str(num_threads)] + cmd
+        # number of MPI processes
+        cores = getattr(CURRENT_RUN, "cores", None)
+        if cores is not None:
+            mpi_opts = PLACEMENT.mpirun_options(cores)
+        else:
+            mpi_opts = ["--use-hwthread-cpus"]
+        cmd = ["mpirun"] + mpi_opts + ["-np", str(num_threads)] + cmd
 
     out, err = launch_process(cmd)
 
@@ -456,26 +784,26 @@ def compute_dipha(fname, times, backend):
         "mem": dipha_mem_peak(out),
         "#threads": num_threads,
     }
-    res.update(get_pairs_number(outp))
-    times[dataset].setdefault(b, {}).update(
-        {("seq" if num_threads == 1 else "para"): res}
-    )
+    res.update(get_mem_profile(err))
+    res.update(get_perf_counters(err))
+    res.update(get_pairs_number(outp, dataset, backend))
+    times[dataset].setdefault(b, {}).update({run_mode(num_threads): res})
     store_log(out, dataset, "dipha", num_threads)
     return elapsed
 
 
 def compute_cubrips(fname, times, backend):
     dataset = dataset_name(fname)
-    outp = f"diagrams/{dataset}_{backend.value}.dipha"
+    outp = scratch_file(backend.get_diagram_file(dataset))
     if "x1_" in dataset:
         binary = "CubicalRipser_2dim/CR2"
     else:
         binary = "CubicalRipser_3dim/CR3"
     cmd = (
-        [f"backends_src/{binary}"]
+        [os.path.abspath(f"backends_src/{binary}")]
         + ["--output", outp]
         + ["--method", "compute_pairs"]
-        + [fname]
+        + [os.path.abspath(fname)]
     )
 
     _, err = launch_process(cmd)
@@ -485,15 +813,17 @@ def compute_cubrips(fname, times, backend):
         "pers": elapsed,
         "mem": mem,
     }
-    res.update(get_pairs_number(outp))
+    res.update(get_mem_profile(err))
+    res.update(get_perf_counters(err))
+    res.update(get_pairs_number(outp, dataset, backend))
     times[dataset][backend.value] = {"seq": res}
     return elapsed
 
 
 def compute_gudhi_dionysus(fname, times, backend):
     dataset = dataset_name(fname)
+    outp = scratch_file(backend.get_diagram_file(dataset))
     backend = backend.value
-    outp = f"diagrams/{dataset}_{backend}.gudhi"
 
     def compute_time(output):
         prec_pat = r"^Filled filtration.*: (\d+.\d+|\d+)s$"
@@ -509,13 +839,14 @@ def compute_gudhi_dionysus(fname, times, backend):
         return (prec, pers)
 
     cmd = (
-        ["python3", "dionysus_gudhi_persistence.py"]
-        + ["-i", fname]
+        ["python3", os.path.abspath("dionysus_gudhi_persistence.py")]
+        + ["-i", os.path.abspath(fname)]
         + ["-o", outp]
         + ["-b", backend.lower()]
+        + ["-p", os.path.abspath("build_dirs/gudhi/src/python")]
     )
 
-    out, err = launch_process(cmd)
+    out, err = launch_python(cmd)
     prec, pers = compute_time(out)
     elapsed, mem = get_time_mem(err)
     res = {
@@ -523,10 +854,14 @@ def compute_gudhi_dionysus(fname, times, backend):
         "pers": pers,
         "mem": mem,
     }
-    res.update(get_pairs_number(outp))
+    res.update(get_mem_profile(err))
+    res.update(get_perf_counters(err))
+    res.update(get_startup(err))
+    res.update(get_pairs_number(outp, dataset, backend))
     if backend == "Gudhi":
-        res.update({"#threads": multiprocessing.cpu_count()})
-        times[dataset][backend] = {"para": res}
+        # multi-threaded, not configurable (see get_thread_numbers)
+        res.update({"#threads": max_threads()})
+        times[dataset].setdefault(backend, {}).update({run_mode(max_threads()): res})
     else:
         times[dataset][backend] = {"seq": res}
     return elapsed
@@ -535,7 +870,7 @@ def compute_gudhi_dionysus(fname, times, backend):
 @parallel_decorator
 def compute_oineus(fname, times, backend, num_threads=1):
     dataset = dataset_name(fname)
-    outp = f"diagrams/{dataset}_{backend.value}.gudhi"
+    outp = scratch_file(backend.get_diagram_file(dataset))
 
     def oineus_compute_time(oineus_output):
         pat = r"matrix reduced in (\d+.\d+|\d+)"
@@ -543,11 +878,19 @@ def compute_oineus(fname, times, backend, num_threads=1):
         return round(float(pers_time), 3)
 
     # launch with subprocess to capture stdout from the C++ library
-    cmd = ["python3", "oineus_persistence.py", fname, "-o", outp]
+    cmd = [
+        "python3",
+        os.path.abspath("oineus_persistence.py"),
+        os.path.abspath(fname),
+        "-o",
+        outp,
+        "-p",
+        os.path.abspath("build_dirs/oineus/bindings/python"),
+    ]
     if num_threads > 1:
         cmd.extend(["-t", str(num_threads)])
 
-    _, err = launch_process(cmd)
+    _, err = launch_python(cmd)
     pers = oineus_compute_time(err)
     elapsed, mem = get_time_mem(err)
     res = {
@@ -556,10 +899,11 @@ def compute_oineus(fname, times, backend, num_threads=1):
         "mem": mem,
         "#threads": num_threads,
     }
-    res.update(get_pairs_number(outp))
-    times[dataset].setdefault(backend.value, {}).update(
-        {("seq" if num_threads == 1 else "para"): res}
-    )
+    res.update(get_mem_profile(err))
+    res.update(get_perf_counters(err))
+    res.update(get_startup(err))
+    res.update(get_pairs_number(outp, dataset, backend))
+    times[dataset].setdefault(backend.value, {}).update({run_mode(num_threads): res})
 
     return elapsed
 
@@ -567,7 +911,7 @@ def compute_oineus(fname, times, backend, num_threads=1):
 @parallel_decorator
 def compute_oineus_simpl(fname, times, backend, num_threads=1):
     dataset = dataset_name(fname)
-    outp = f"diagrams/{dataset}_{backend.value}.gudhi"
+    outp = scratch_file(backend.get_diagram_file(dataset))
 
     def oineus_compute_time(oineus_output):
         pat = r".*elapsed = (\d+.\d+|\d+) sec"
@@ -575,7 +919,10 @@ def compute_oineus_simpl(fname, times, backend, num_threads=1):
         return round(float(pers_time), 3)
 
     # launch with subprocess to capture stdout from the C++ library
-    cmd = ["build_dirs/oineus/oineus_filtration", fname]
+    cmd = [
+        os.path.abspath("build_dirs/oineus/oineus_filtration"),
+        os.path.abspath(fname),
+    ]
     if num_threads > 1:
         cmd.extend(["-t", str(num_threads)])
 
@@ -588,22 +935,22 @@ def compute_oineus_simpl(fname, times, backend, num_threads=1):
         "mem": mem,
         "#threads": num_threads,
     }
-    os.rename("diag.gudhi", outp)
-    res.update(get_pairs_number(outp))
-    times[dataset].setdefault(backend.value, {}).update(
-        {("seq" if num_threads == 1 else "para"): res}
-    )
+    os.rename(scratch_file("diag.gudhi"), outp)
+    res.update(get_mem_profile(err))
+    res.update(get_perf_counters(err))
+    res.update(get_pairs_number(outp, dataset, backend))
+    times[dataset].setdefault(backend.value, {}).update({run_mode(num_threads): res})
 
     return elapsed
 
 
 def compute_diamorse(fname, times, backend):
     dataset = dataset_name(fname)
-    outp = f"diagrams/{dataset}_{backend.value}.gudhi"
+    outp = scratch_file(backend.get_diagram_file(dataset))
     cmd = [
         "python2",
-        "backends_src/diamorse/python/persistence.py",
-        fname,
+        os.path.abspath("backends_src/diamorse/python/persistence.py"),
+        os.path.abspath(fname),
         "-r",
         "-o",
         outp,
@@ -617,16 +964,22 @@ def compute_diamorse(fname, times, backend):
         "mem": mem,
     }
 
-    res.update(get_pairs_number(outp))
+    res.update(get_mem_profile(err))
+    res.update(get_perf_counters(err))
+    res.update(get_pairs_number(outp, dataset, backend))
     times[dataset][backend.value] = {"seq": res}
     return elapsed
 
 
 def compute_perseus(fname, times, backend):
     dataset = dataset_name(fname)
-    outp = f"diagrams/{dataset}-{backend.value}.gudhi"
+    outp = scratch_file(backend.get_diagram_file(dataset))
     subc = "simtop" if backend == SoftBackend.PERSEUS_SIM else "cubtop"
-    cmd = ["backends_src/perseus/perseus", subc, fname]
+    cmd = [
+        os.path.abspath("backends_src/perseus/perseus"),
+        subc,
+        os.path.abspath(fname),
+    ]
 
     _, err = launch_process(cmd)
     elapsed, mem = get_time_mem(err)
@@ -637,17 +990,19 @@ def compute_perseus(fname, times, backend):
     }
 
     # convert output to Gudhi format
-    pers2gudhi.main("output", outp)
+    pers2gudhi.main(scratch_file("output"), outp)
 
-    res.update(get_pairs_number(outp))
+    res.update(get_mem_profile(err))
+    res.update(get_perf_counters(err))
+    res.update(get_pairs_number(outp, dataset, backend))
     times[dataset][backend.value.split("_")[0]] = {"seq": res}
     return elapsed
 
 
 def compute_eirene(fname, times, backend):
     dataset = dataset_name(fname)
-    outp = f"diagrams/{dataset}_{backend.value}.gudhi"
-    cmd = ["julia", "call_eirene.jl", fname, outp]
+    outp = scratch_file(backend.get_diagram_file(dataset))
+    cmd = ["julia", os.path.abspath("call_eirene.jl"), os.path.abspath(fname), outp]
 
     def compute_pers_time(output):
         pers_pat = r"^(\d+.\d+|\d+) seconds.*$"
@@ -664,18 +1019,21 @@ def compute_eirene(fname, times, backend):
         "mem": mem,
     }
 
-    res.update(get_pairs_number(outp))
+    res.update(get_mem_profile(err))
+    res.update(get_perf_counters(err))
+    res.update(get_pairs_number(outp, dataset, backend))
     times[dataset][backend.value] = {"seq": res}
     return elapsed
 
 
 def compute_javaplex(fname, times, backend):
     dataset = dataset_name(fname)
-    outp = f"diagrams/{dataset}_{backend.value}.gudhi"
+    outp = scratch_file(backend.get_diagram_file(dataset))
+    classpath = [os.path.abspath("."), os.path.abspath("backends_src/javaplex.jar")]
     cmd = (
         ["java", "-Xmx64G"]
-        + ["-classpath", ".:backends_src/javaplex.jar"]
-        + ["jplex_persistence", fname, outp]
+        + ["-classpath", ":".join(classpath)]
+        + ["jplex_persistence", os.path.abspath(fname), outp]
     )
 
     def compute_pers_time(output):
@@ -691,23 +1049,37 @@ def compute_javaplex(fname, times, backend):
         "prec": round(elapsed - pers, 3),
         "pers": pers,
         "mem": mem,
-        "#threads": multiprocessing.cpu_count(),
+        "#threads": max_threads(),
     }
 
-    res.update(get_pairs_number(outp))
-    times[dataset][backend.value] = {"para": res}
+    res.update(get_mem_profile(err))
+    res.update(get_perf_counters(err))
+    res.update(get_pairs_number(outp, dataset, backend))
+    # multi-threaded, not configurable (see get_thread_numbers)
+    mode = run_mode(max_threads())
+    times[dataset].setdefault(backend.value, {}).update({mode: res})
     return elapsed
 
 
 @parallel_decorator
 def compute_phat(fname, times, backend, num_threads=1):
     dataset = dataset_name(fname)
-    outp = f"diagrams/{dataset}_{backend.value}.gudhi"
-    cmd = [sys.executable, "phat2gudhi.py", "-o", outp, fname, "-t", str(num_threads)]
+    outp = scratch_file(backend.get_diagram_file(dataset))
+    cmd = [
+        sys.executable,
+        os.path.abspath("phat2gudhi.py"),
+        "-o",
+        outp,
+        os.path.abspath(fname),
+        "-t",
+        str(num_threads),
+        "-p",
+        os.path.abspath("build_dirs/phat/phat"),
+    ]
     if backend == SoftBackend.PHAT_CHUNK:
         cmd += ["-b", "chunk"]
 
-    out, err = launch_process(cmd)
+    out, err = launch_python(cmd)
 
     def compute_pers_time(output):
         pers_pat = r"Computing persistence pairs took (\d+.\d+|\d+)s"
@@ -715,30 +1087,41 @@ def compute_phat(fname, times, backend, num_threads=1):
         pers = round(float(pers), 3)
         return pers
 
+    def compute_load_time(output):
+        load_pat = r"Reading input file took (\d+.\d+|\d+)s"
+        load = re.search(load_pat, output, re.MULTILINE)
+        return None if load is None else round(float(load.group(1)), 3)
+
     elapsed, mem = get_time_mem(err)
     pers = compute_pers_time(out)
     res = {
         "prec": round(elapsed - pers, 3),
         "pers": pers,
         "mem": mem,
-        "#threads": multiprocessing.cpu_count(),
+        "#threads": num_threads,
+        # boundary matrix format, its loading time is part of prec
+        "input_format": "binary" if phat2gudhi.is_binary(fname) else "ascii",
     }
-
-    res.update(get_pairs_number(outp))
-    times[dataset].setdefault(backend.value, {}).update(
-        {("seq" if num_threads == 1 else "para"): res}
-    )
+    load = compute_load_time(out)
+    if load is not None:
+        res["load"] = load
+
+    res.update(get_mem_profile(err))
+    res.update(get_perf_counters(err))
+    res.update(get_startup(err))
+    res.update(get_pairs_number(outp, dataset, backend))
+    times[dataset].setdefault(backend.value, {}).update({run_mode(num_threads): res})
     return elapsed
 
 
 @parallel_decorator
 def compute_persistenceCycles(fname, times, backend, num_threads=1):
     dataset = dataset_name(fname)
-    outp = f"diagrams/{dataset}_{backend.value}.gudhi"
+    outp = scratch_file(backend.get_diagram_file(dataset))
     cmd = [
         sys.executable,
-        "persistentCycles.py",
-        fname,
+        os.path.abspath("persistentCycles.py"),
+        os.path.abspath(fname),
         "-o",
         outp,
         "-t",
@@ -765,50 +1148,443 @@ def compute_persistenceCycles(fname, times, backend, num_threads=1):
         "#threads": num_threads,
     }
 
-    res.update(get_pairs_number(outp))
-    times[dataset].setdefault(backend.value, {}).update(
-        {("seq" if num_threads == 1 else "para"): res}
-    )
+    res.update(get_mem_profile(err))
+    res.update(get_perf_counters(err))
+    res.update(get_pairs_number(outp, dataset, backend))
+    times[dataset].setdefault(backend.value, {}).update({run_mode(num_threads): res})
     return elapsed
 
 
-def dispatch(fname, times):
+class RunUnit:
+    """One backend run on one dataset with a given number of threads"""
+
+    def __init__(self, fname, backend, num_threads):
+        self.fname = fname
+        self.backend = backend
+        self.num_threads = num_threads
+        self.timeout = TIMEOUT_S
+
+    @property
+    def mode(self):
+        return run_mode(self.num_threads)
+
+    def __repr__(self):
+        return f"{dataset_name(self.fname)}/{self.backend.value}/{self.num_threads}T"
+
+
+def is_processed(unit, times):
+    """If the resumed results already hold this backend run"""
+    dsname = dataset_name(unit.fname)
+    if RESUME_CELLS is not None:
+        return (dsname, unit.backend.value, unit.mode) in RESUME_CELLS
+    # results table: look for the run mode or for an aborted run
+    res = times.get(dsname, {})
+    if unit.mode in res.get(unit.backend.get_result_key(), {}):
+        return True
+    for key in [unit.backend.value, unit.backend.get_timeout_key()]:
+        if any(k in res.get(key, {}) for k in ["timeout", "error", "skipped"]):
+            return True
+    return False
+
+
+def get_units(fname, times, selection=None):
     from convert_datasets import SliceType
 
     slice_type = SliceType.from_filename(fname)
     complex_type = Complex.from_filename(fname)
     file_type = FileType.from_filename(fname, complex_type)
     backends = file_type.get_backends(slice_type)
+    if selection is not None:
+        backends = [b for b in backends if b.value in selection]
 
+    units = []
     for b in backends:
-        dsname = dataset_name(fname)
-        if RESUME and dsname in times and b.value in times[dsname]:
-            logging.info("Skipping %s already processed by %s", dsname, b.value)
-            return
+        for nt in b.get_thread_numbers():
+            unit = RunUnit(fname, b, nt)
+            if RESUME and is_processed(unit, times):
+                logging.info("Skipping %s (already processed)", unit)
+                continue
+            units.append(unit)
+    return units
+
+
+def predict_memory(unit, times):
+    """Peak memory (MB) of a backend run extrapolated from the previous
+    runs of the same backend, None without history"""
+    dsname = dataset_name(unit.fname)
+    key = unit.backend.get_result_key()
+    samples = []
+    for table in [times, HISTORY]:
+        samples += history.get_samples(table, key, "mem", unit.mode, like=dsname)
+    if not samples:
+        for table in [times, HISTORY]:
+            samples += history.get_samples(table, key, "mem", like=dsname)
+    return history.predict(samples, history.dataset_size(dsname)[1])
+
+
+def admit_unit(unit, times):
+    """Memory (MB) to reserve for a backend run, None if the run is
+    predicted to exceed the memory budget (recorded as skipped)"""
+    if MEM_BUDGET_MB is None:
+        return 0
+    mem = predict_memory(unit, times)
+    if mem is None:
+        # unknown memory footprint: do not share the budget
+        logging.info("No memory history for %s, reserving the whole budget", unit)
+        return MEM_BUDGET_MB
+    if mem > MEM_BUDGET_MB:
+        logging.warning(
+            "Skipping %s: predicted memory peak %dMB exceeds the budget (%dMB)",
+            unit,
+            mem,
+            MEM_BUDGET_MB,
+        )
+        record_results(unit, times, {unit.backend.value: {"skipped": "memory"}})
+        return None
+    return round(mem)
+
+
+def predict_time(unit, times):
+    """Computation time (s) of a backend run extrapolated from the
+    previous runs of the same backend, None without history"""
+    dsname = dataset_name(unit.fname)
+    key = unit.backend.get_result_key()
+    fields = ["prec", "pers"]
+    samples = []
+    for table in [times, HISTORY]:
+        samples += history.get_samples(table, key, fields, unit.mode, like=dsname)
+    if not samples:
+        for table in [times, HISTORY]:
+            samples += history.get_samples(table, key, fields, like=dsname)
+    return history.predict(samples, history.dataset_size(dsname)[1])
+
+
+def is_hopeless(unit, times):
+    """If a backend run is predicted to reach the timeout: the backend
+    already timed out on a smaller dataset, or its computation time
+    extrapolated from smaller datasets exceeds the timeout"""
+    dsname = dataset_name(unit.fname)
+    size = history.dataset_size(dsname)[1]
+    key = unit.backend.get_timeout_key()
+    for table in [times, HISTORY]:
+        sizes = history.timeout_sizes(table, key, TIMEOUT_S, like=dsname)
+        if any(s <= size for s in sizes):
+            logging.info("%s timed out on a smaller dataset", unit.backend.value)
+            return True
+    pred = predict_time(unit, times)
+    if pred is not None and pred > TIMEOUT_S:
+        logging.info("Predicted computation time for %s: %ds", unit, pred)
+        return True
+    return False
+
+
+def plan_timeout(unit, times):
+    """Set the timeout of a backend run according to the timeout policy.
+    Returns False if the run is skipped (recorded as a predicted
+    timeout)"""
+    unit.timeout = TIMEOUT_S
+    if TIMEOUT_POLICY == "fixed" or not is_hopeless(unit, times):
+        return True
+    if TIMEOUT_POLICY == "skip":
+        logging.warning("Skipping %s: predicted to reach the timeout", unit)
+        key = unit.backend.get_timeout_key()
+        record_results(unit, times, {key: {"timeout": "predicted"}})
+        return False
+    # shorten: a cheap confirmation of the prediction
+    unit.timeout = max(1, round(TIMEOUT_S * SHORT_TIMEOUT_RATIO))
+    logging.info("Timeout of %s shortened to %ds", unit, unit.timeout)
+    return True
+
+
+# measurements summarized over repeated runs
+REPEATED_FIELDS = ["prec", "pers", "load", "mem", "mem_mean", "mem_peak_time"]
+
+
+def aggregate_trials(trials):
+    """Merge the results of repeated runs: the measured fields are
+    replaced by their median, every sample is kept under "samples" and
+    robust statistics under "stats"
+    """
+    if len(trials) == 1:
+        return trials[0]
+    res = {}
+    for backend, modes in trials[0].items():
+        for mode, base in modes.items():
+            runs = [t[backend][mode] for t in trials]
+            agg = dict(base)
+            agg["samples"] = []
+            agg["stats"] = {}
+            for field in REPEATED_FIELDS:
+                vals = [r[field] for r in runs if field in r]
+                if len(vals) != len(runs):
+                    continue
+                agg["stats"][field] = robust_stats.summarize(vals)
+                agg[field] = agg["stats"][field]["median"]
+            for r in runs:
+                agg["samples"].append({f: r[f] for f in REPEATED_FIELDS if f in r})
+            res.setdefault(backend, {})[mode] = agg
+    return res
 
-        logging.info("Processing %s with %s...", fname.split("/")[-1], b.value)
 
-        try:  # catch exception at every backend call
+def record_results(unit, times, res):
+    """Merge the results of a backend run in the results table and
+    append them to the journal"""
+    dsname = dataset_name(unit.fname)
+    for backend, modes in res.items():
+        times[dsname].setdefault(backend, {}).update(modes)
+    if JOURNAL is not None:
+        JOURNAL.append(
+            {
+                "dataset": dsname,
+                "#Vertices": times[dsname].get("#Vertices"),
+                "backend": unit.backend.value,
+                "#threads": unit.num_threads,
+                "mode": unit.mode,
+                "results": res,
+            }
+        )
 
-            # call backend compute function
-            el = b.get_compute_function()(fname, times, b)
 
-            logging.info("  Done in %.3fs", el)
-        except subprocess.TimeoutExpired:
-            logging.warning(
-                "  Timeout reached after %ds, computation aborted", TIMEOUT_S
-            )
-            bv = b.value
-            if "Perseus" in bv:
-                bv = "Perseus"
-            times[dsname].setdefault(bv.replace("_", "/"), {}).update(
-                {"timeout": TIMEOUT_S}
+def run_unit(unit):
+    """Run a backend on a dataset, returns its results entries"""
+    fname, b = unit.fname, unit.backend
+    dsname = dataset_name(fname)
+    logging.info(
+        "Processing %s with %s (%d thread(s))...",
+        fname.split("/")[-1],
+        b.value,
+        unit.num_threads,
+    )
+    CURRENT_RUN.log = f"logs/{dsname}.{b.value}.{unit.num_threads}T"
+    CURRENT_RUN.trace = f"{CURRENT_RUN.log}.trace.csv"
+    for ext in ["out", "err"]:
+        # backend outputs of this run only
+        pathlib.Path(f"{CURRENT_RUN.log}.{ext}").unlink(missing_ok=True)
+    CURRENT_RUN.timeout = unit.timeout
+
+    cache_key = None
+    if CACHE is not None:
+        params = {
+            "timeout": unit.timeout,
+            "repeat": REPEAT,
+            "warmup": WARMUP,
+            "placement": str(PLACEMENT),
+        }
+        if PERF_COUNTERS:
+            # keep the keys of the results without counters
+            params["perf_counters"] = True
+        if PYTHON_STARTUP != "cold":
+            params["python_startup"] = PYTHON_STARTUP
+        cache_key = CACHE.key(
+            fname, b.value, unit.num_threads, b.get_executables(), params
+        )
+        res = CACHE.get(cache_key, b.get_diagram_file(dsname))
+        if res is not None:
+            logging.info("  Cached results found, skipping computation")
+            return res
+
+    try:  # catch exception at every backend call
+        # private working directory of the backend, removed with its
+        # temporary files (and partial outputs if the run fails)
+        with tempfile.TemporaryDirectory(
+            prefix=f"{dsname}.{b.value}.", dir=SCRATCH_DIR
+        ) as scratch:
+            CURRENT_RUN.scratch = scratch
+            trials = []
+            for i in range(WARMUP + REPEAT):
+                # call backend compute function
+                trial = {dsname: {}}
+                func = b.get_compute_function()
+                if b.is_multithreaded():
+                    el = func(fname, trial, b, num_threads=unit.num_threads)
+                else:
+                    el = func(fname, trial, b)
+
+                if i < WARMUP:
+                    logging.info("  Warm-up run done in %.3fs", el)
+                else:
+                    logging.info("  Done in %.3fs", el)
+                    trials.append(trial[dsname])
+
+            # move the diagram of the last run (and then its binary
+            # store, more recent) into diagrams/
+            publish(b.get_diagram_file(dsname))
+            publish(diagram_store.store_file(b.get_diagram_file(dsname)))
+
+        res = aggregate_trials(trials)
+        cores = getattr(CURRENT_RUN, "cores", None)
+        if cores is not None:
+            # record the placement to make the results reproducible
+            for modes in res.values():
+                for run in modes.values():
+                    run["placement"] = {
+                        "policy": str(PLACEMENT),
+                        "cpus": placement.format_cpulist(cores),
+                    }
+        if CACHE is not None:
+            meta = {"dataset": dsname, "backend": b.value, "#threads": unit.num_threads}
+            CACHE.put(cache_key, res, b.get_diagram_file(dsname), meta)
+        return res
+    except subprocess.TimeoutExpired:
+        logging.warning(
+            "  Timeout reached after %ds, computation aborted", unit.timeout
+        )
+        if unit.timeout < TIMEOUT_S:
+            # shortened timeout: the prediction is confirmed
+            return {b.get_timeout_key(): {"timeout": "predicted"}}
+        return {b.get_timeout_key(): {"timeout": TIMEOUT_S}}
+    except subprocess.CalledProcessError:
+        logging.error("  Process aborted")
+        return {b.value: {"error": "abort"}}
+    finally:
+        CURRENT_RUN.scratch = None
+
+
+def dispatch(fname, times, selection=None):
+    for unit in get_units(fname, times, selection):
+        if plan_timeout(unit, times) and admit_unit(unit, times) is not None:
+            if PLACEMENT_CPUS is not None:
+                CURRENT_RUN.cores = PLACEMENT_CPUS[: unit.num_threads]
+            record_results(unit, times, run_unit(unit))
+
+
+def dispatch_concurrently(fnames, times, max_jobs):
+    units = []
+    for fname in fnames:
+        units.extend(get_units(fname, times))
+
+    lock = threading.Lock()
+
+    def run(unit, cores):
+        CURRENT_RUN.cores = cores
+        res = run_unit(unit)
+        with lock:
+            record_results(unit, times, res)
+
+    def admit(unit):
+        with lock:
+            if not plan_timeout(unit, times):
+                return None
+            return admit_unit(unit, times)
+
+    scheduler.run_concurrently(
+        units, run, max_jobs, PLACEMENT_CPUS, MEM_BUDGET_MB, admit
+    )
+
+
+def campaign_params(args):
+    """Parameters of a campaign shared by every process executing its
+    runs (workers, batch jobs)"""
+    return {
+        "timeout": args.timeout,
+        "timeout_policy": args.timeout_policy,
+        "sequential": args.sequential,
+        "threads": args.threads,
+        "repeat": args.repeat,
+        "warmup": args.warmup,
+        "sampling_rate": args.sampling_rate,
+        "placement": str(args.placement),
+        "numa_node": args.numa_node,
+        "history": args.history,
+        "perf_counters": args.perf_counters,
+        "python_startup": args.python_startup,
+    }
+
+
+def configure_campaign(params, scratch_dir=None):
+    # pylint: disable=W0603
+    global TIMEOUT_S
+    TIMEOUT_S = params["timeout"]
+    global TIMEOUT_POLICY
+    TIMEOUT_POLICY = params["timeout_policy"]
+    global SEQUENTIAL
+    SEQUENTIAL = params["sequential"]
+    global THREADS
+    THREADS = params["threads"]
+    global REPEAT
+    REPEAT = params["repeat"]
+    global WARMUP
+    WARMUP = params["warmup"]
+    global SAMPLING_RATE
+    SAMPLING_RATE = params["sampling_rate"]
+    global HISTORY
+    HISTORY = history.load_results(params["history"])
+    global MAX_THREADS
+    MAX_THREADS = params.get("max_threads")
+    global PLACEMENT
+    PLACEMENT = placement.Placement(params["placement"])
+    if PLACEMENT != placement.Placement.NONE:
+        global PLACEMENT_CPUS
+        topology = placement.read_topology()
+        PLACEMENT_CPUS = PLACEMENT.order_cpus(topology, params["numa_node"])
+        if not PLACEMENT_CPUS:
+            logging.error(
+                "No available CPU on NUMA node %d (available nodes: %s)",
+                params["numa_node"],
+                ", ".join(str(n) for n in sorted({c.node for c in topology})),
             )
-        except subprocess.CalledProcessError:
-            logging.error("  Process aborted")
-            times[dsname].setdefault(b.value, {}).update({"error": "abort"})
+            sys.exit(1)
+        logging.info(
+            "%s placement on CPUs %s",
+            PLACEMENT,
+            placement.format_cpulist(PLACEMENT_CPUS),
+        )
+    global PERF_COUNTERS
+    PERF_COUNTERS = params.get("perf_counters", False)
+    if PERF_COUNTERS and shutil.which("perf") is None:
+        logging.warning("perf not found: only counting context switches")
+    global PYTHON_STARTUP
+    PYTHON_STARTUP = params.get("python_startup", "cold")
+    global WARM_POOL
+    if PYTHON_STARTUP == "steady" and WARM_POOL is None:
+        WARM_POOL = warm_worker.WarmPool()
+    if PYTHON_STARTUP == "steady" and PERF_COUNTERS:
+        logging.warning("No hardware counters for the warm Python backends")
+    global SCRATCH_DIR
+    if scratch_dir is not None:
+        create_dir(scratch_dir)
+        SCRATCH_DIR = os.path.abspath(scratch_dir)
+
+
+def select_datasets(args, fnames=None):
+    """Input datasets (by default, the converted ones) matching the
+    -1/-2/-3 filters"""
+    if fnames is None:
+        fnames = glob.glob("datasets/*")
+    selected = []
+    for fname in sorted(fnames):
+        if args.only_lines and "x1x1_" not in fname:
+            continue
+        if args.only_slices and ("x1_" not in fname or "x1x1_" in fname):
+            continue
+        if args.only_cubes and "x1_" in fname:
+            continue
+        selected.append(fname)
+    return selected
 
 
+def projected_datasets(args):
+    """Input datasets of the campaign: the converted ones and the ones
+    prepare_datasets would generate from the raw files"""
+    import convert_datasets
+    from convert_datasets import SliceType
+
+    raws = glob.glob("raws/*.raw") + glob.glob("raws/*.vti")
+    # generated by prepare_datasets
+    raws = sorted(set(raws) | {"raws/elevation.vti", "raws/random.vti"})
+    fnames = set(glob.glob("datasets/*"))
+    for raw in raws:
+        for slice_type, rs in [
+            (SliceType.VOL, convert_datasets.RESAMPL_3D),
+            (SliceType.SURF, convert_datasets.RESAMPL_2D),
+            (SliceType.LINE, convert_datasets.RESAMPL_1D),
+        ]:
+            files = convert_datasets.projected_files(raw, rs, slice_type)
+            fnames.update(f"datasets/{f}" for f in files)
+    return select_datasets(args, fnames)
+
+
+@closes_warm_pool
 def compute_diagrams(args):
 
     # output diagrams directory
@@ -819,29 +1595,36 @@ def compute_diagrams(args):
     # store computation times
     times = {}
 
+    configure_campaign(campaign_params(args), args.scratch_dir)
     # pylint: disable=W0603
-    global TIMEOUT_S
-    TIMEOUT_S = args.timeout
-    global SEQUENTIAL
-    SEQUENTIAL = args.sequential
     global RESUME
     RESUME = args.resume is not None
+    global RESUME_CELLS
+    global JOURNAL
+    global MEM_BUDGET_MB
+    MEM_BUDGET_MB = args.mem_budget
+    global CACHE
+    if args.cache is not None:
+        CACHE = result_cache.ResultCache(args.cache, args.cache_size)
+
+    stamp = datetime.datetime.now().isoformat()
+    journal_fname = f"results_{stamp}.jsonl"
+    result_fname = f"results_{stamp}.json"
 
     if RESUME:
         logging.info("Resuming computation from %s", args.resume)
-        with open(args.resume) as src:
-            times = json.load(src)
-
-    result_fname = f"results_{datetime.datetime.now().isoformat()}.json"
-
-    for fname in sorted(glob.glob("datasets/*")):
-        if args.only_lines and "x1x1_" not in fname:
-            continue
-        if args.only_slices and ("x1_" not in fname or "x1x1_" in fname):
-            continue
-        if args.only_cubes and "x1_" in fname:
-            continue
-
+        if args.resume.endswith(".jsonl"):
+            # keep appending to the resumed journal
+            records = run_journal.read_journal(args.resume)
+            times = run_journal.compact(records)
+            RESUME_CELLS = run_journal.done_cells(records)
+            journal_fname = args.resume
+        else:
+            with open(args.resume) as src:
+                times = json.load(src)
+
+    fnames = select_datasets(args)
+    for fname in fnames:
         # initialize compute times table
         dsname = dataset_name(fname)
         if times.get(dsname) is None:
@@ -849,18 +1632,377 @@ def compute_diagrams(args):
                 "#Vertices": dsname.split("_")[-3],
             }
 
-        # call dispatch function per dataset
-        dispatch(fname, times)
+    if TIMEOUT_POLICY != "fixed":
+        # smaller datasets first, to extrapolate the computation times
+        fnames.sort(key=lambda f: history.dataset_size(dataset_name(f))[1])
 
-        # write partial results after every dataset computation
-        with open(result_fname, "w") as dst:
-            json.dump(times, dst, indent=4)
+    if args.queue is not None:
+        # coordinator: the runs are executed by `main.py worker`
+        publish_units(args.queue, fnames, times, campaign_params(args))
+        return times
+
+    JOURNAL = run_journal.RunJournal(journal_fname)
+    logging.info("Journal of the completed runs: %s", journal_fname)
+
+    if args.jobs > 1:
+        # pack independent backend runs on disjoint core sets
+        dispatch_concurrently(fnames, times, args.jobs)
+    else:
+        for fname in fnames:
+            # call dispatch function per dataset
+            dispatch(fname, times)
+
+    # nested results table (same as `main.py compact` on the journal)
+    with open(result_fname, "w") as dst:
+        json.dump(times, dst, indent=4)
 
     # post-process generated Gudhi diagrams
     gudhi_diag_inf.main()
     return times
 
 
+def publish_units(queue_fname, fnames, times, params):
+    queue = work_queue.WorkQueue(queue_fname)
+    units = []
+    for fname in fnames:
+        for unit in get_units(fname, times):
+            units.append((unit.fname, unit.backend.value, unit.num_threads))
+    n = queue.publish(units, params)
+    logging.info("Published %d new run units to %s", n, queue_fname)
+    logging.info("Start workers with `python3 main.py worker %s`", queue_fname)
+
+
+@closes_warm_pool
+def run_worker(args):
+    create_dir("diagrams")
+    create_dir("logs")
+
+    queue = work_queue.WorkQueue(args.queue)
+    # campaign parameters set by the coordinator
+    configure_campaign(queue.params(), args.scratch_dir)
+    # pylint: disable=W0603
+    # results are pushed to the queue instead of a local journal
+    global JOURNAL
+    JOURNAL = queue
+    # memory budget of this worker (its node may differ from the others)
+    global MEM_BUDGET_MB
+    MEM_BUDGET_MB = args.mem_budget
+    if args.cpus is not None:
+        # cores of this worker, when several workers share a node
+        global PLACEMENT_CPUS
+        cpus = placement.parse_cpulist(args.cpus)
+        if PLACEMENT_CPUS is not None:
+            PLACEMENT_CPUS = [c for c in PLACEMENT_CPUS if c in cpus]
+        else:
+            PLACEMENT_CPUS = cpus
+        if not PLACEMENT_CPUS:
+            logging.error("No available CPU in %s", args.cpus)
+            sys.exit(1)
+        logging.info("Worker CPUs: %s", placement.format_cpulist(PLACEMENT_CPUS))
+
+    worker = args.name or f"{socket.gethostname()}.{os.getpid()}"
+    logging.info("Worker %s started on %s", worker, args.queue)
+    n_runs = 0
+    while True:
+        task = queue.claim(worker, args.lease)
+        if task is None:
+            if queue.unfinished() == 0:
+                break
+            # units leased by other workers may be released
+            time.sleep(args.poll)
+            continue
+        unit_id, fname, backend, num_threads = task
+        unit = RunUnit(fname, SoftBackend(backend), num_threads)
+        # results of every worker, for the timeout predictions
+        times = run_journal.compact(queue.records())
+        dsname = dataset_name(fname)
+        times.setdefault(dsname, {"#Vertices": dsname.split("_")[-3]})
+        with queue.lease(unit_id, worker, args.lease):
+            if plan_timeout(unit, times) and admit_unit(unit, times) is not None:
+                if PLACEMENT_CPUS is not None:
+                    CURRENT_RUN.cores = PLACEMENT_CPUS[: unit.num_threads]
+                record_results(unit, times, run_unit(unit))
+        queue.complete(unit_id, worker)
+        n_runs += 1
+
+    logging.info("Worker %s done (%d runs): %s", worker, n_runs, queue.status())
+
+
+def plan_runs(args, fnames):
+    """Backend runs of a campaign with their predicted computation time
+    (s, over every trial) and memory peak (MB)"""
+    times = {}
+    runs = []
+    for fname in fnames:
+        for unit in get_units(fname, times, args.backends):
+            pred = predict_time(unit, times)
+            if TIMEOUT_POLICY != "fixed" and is_hopeless(unit, times):
+                if TIMEOUT_POLICY == "skip":
+                    logging.info("Not planning %s (predicted timeout)", unit)
+                    continue
+                duration = max(1, round(TIMEOUT_S * SHORT_TIMEOUT_RATIO))
+            else:
+                # unknown computation time: the whole timeout
+                duration = TIMEOUT_S if pred is None else min(pred, TIMEOUT_S)
+            mem = predict_memory(unit, times)
+            runs.append(
+                {
+                    "fname": unit.fname,
+                    "backend": unit.backend.value,
+                    "#threads": unit.num_threads,
+                    # warm-up and measured trials
+                    "time": duration * (REPEAT + WARMUP),
+                    "mem": args.mem_default if mem is None else mem,
+                    "predicted": {"time": pred is not None, "mem": mem is not None},
+                }
+            )
+    return runs
+
+
+def estimate_campaign(args, fnames, runs):
+    """Log the projected disk usage, computation time and memory peak of
+    a campaign, warn when they exceed the budgets"""
+    import batch_plan
+
+    gb = 1024**3
+    existing, projected = batch_plan.disk_usage(fnames)
+    n_missing = sum(1 for f in fnames if not os.path.isfile(f))
+    logging.info("%d dataset files (%d to convert)", len(fnames), n_missing)
+    for key in sorted(set(existing) | set(projected)):
+        logging.info(
+            "  %s: %.1fGB on disk, %.1fGB to convert",
+            key,
+            existing.get(key, 0) / gb,
+            projected.get(key, 0) / gb,
+        )
+    to_write = sum(projected.values())
+    disk_budget = args.disk_budget
+    if disk_budget is None:
+        disk_budget = shutil.disk_usage(".").free / gb
+    logging.info(
+        "Disk: %.1fGB to convert (%.1fGB already converted, budget %.1fGB)",
+        to_write / gb,
+        sum(existing.values()) / gb,
+        disk_budget,
+    )
+    if to_write > disk_budget * gb:
+        logging.warning("Converted datasets exceed the disk budget")
+
+    unknown = [r for r in runs if not r["predicted"]["time"]]
+    cpu_hours = sum(r["time"] * r["#threads"] for r in runs) / 3600
+    logging.info(
+        "CPU time: %.1fh for %d runs (%d without history counted at the timeout)",
+        cpu_hours,
+        len(runs),
+        len(unknown),
+    )
+
+    mem_budget = args.mem_budget
+    if mem_budget is None:
+        # physical memory of this machine
+        mem_budget = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        mem_budget //= 1024**2
+    num_cores = args.cores
+    if num_cores is None:
+        num_cores = len(PLACEMENT_CPUS or scheduler.available_cores())
+    sim_runs = []
+    for run in runs:
+        mem = run["mem"] if run["predicted"]["mem"] else 0
+        if args.mem_budget is not None:
+            if mem > args.mem_budget:
+                # skipped by admit_unit
+                continue
+            if not run["predicted"]["mem"]:
+                mem = args.mem_budget
+        sim_runs.append((run["#threads"], run["time"], mem))
+    wall, mem_peak = scheduler.simulate(sim_runs, args.jobs, num_cores, args.mem_budget)
+    logging.info(
+        "Wall time: %.1fh (%d concurrent runs on %d cores)",
+        wall / 3600,
+        args.jobs,
+        num_cores,
+    )
+
+    known_mem = [r["mem"] for r in runs if r["predicted"]["mem"]]
+    logging.info(
+        "Memory peak: %dMB for the largest run, %dMB for the concurrent runs "
+        "(%d runs without history)",
+        max(known_mem, default=0),
+        mem_peak,
+        len(runs) - len(known_mem),
+    )
+    too_large = [m for m in known_mem if m > mem_budget]
+    if too_large:
+        logging.warning(
+            "%d runs exceed the memory budget (%dMB)", len(too_large), mem_budget
+        )
+    elif mem_peak > mem_budget:
+        logging.warning(
+            "Concurrent runs exceed the memory budget (%dMB): reduce -j or set -m",
+            mem_budget,
+        )
+
+    return {
+        "disk": {"existing": existing, "projected": projected},
+        "cpu_hours": cpu_hours,
+        "wall_hours": wall / 3600,
+        "mem_peak": mem_peak,
+    }
+
+
+def plan_campaign(args):
+    import batch_plan
+
+    params = campaign_params(args)
+    if args.cores is not None:
+        # thread numbers of the runs on the compute nodes (also used by
+        # the batch jobs)
+        params["max_threads"] = args.cores
+    configure_campaign(params)
+    fnames = projected_datasets(args)
+    runs = plan_runs(args, fnames)
+    estimates = estimate_campaign(args, fnames, runs)
+    if args.emit is None:
+        return estimates
+
+    # job arrays of the converted datasets
+    runs = [r for r in runs if os.path.isfile(r["fname"])]
+    walltime = batch_plan.parse_walltime(args.walltime)
+    if TIMEOUT_S + batch_plan.JOB_OVERHEAD_S > walltime:
+        logging.warning(
+            "Timeout (%ds) longer than the walltime (%ds): runs may be killed",
+            TIMEOUT_S,
+            walltime,
+        )
+    arrays = batch_plan.make_arrays(runs, walltime)
+    scripts = batch_plan.write_plan(
+        arrays, params, args.emit, args.out_dir, args.queue_name
+    )
+    for array, script in zip(arrays, scripts):
+        logging.info(
+            "%s: %d jobs (%d cores, %dGB, %s)",
+            script,
+            len(array["jobs"]),
+            array["ncpus"],
+            array["mem_gb"],
+            batch_plan.format_walltime(array["walltime"]),
+        )
+    logging.info("Submit with %s/submit.sh", args.out_dir)
+    logging.info("Collect the results with `main.py compact %s`", args.out_dir)
+    return arrays
+
+
+@closes_warm_pool
+def run_job(args):
+    import batch_plan
+
+    create_dir("diagrams")
+    create_dir("logs")
+
+    params, runs = batch_plan.load_job(args.plan, args.array, args.index)
+    configure_campaign(params, args.scratch_dir)
+    # partial results of this job, next to the plan
+    global JOURNAL  # pylint: disable=W0603
+    out_dir = os.path.dirname(args.plan)
+    JOURNAL = run_journal.RunJournal(
+        f"{out_dir}/results_{args.array}_{args.index}.jsonl"
+    )
+
+    times = {}
+    for run in runs:
+        unit = RunUnit(run["fname"], SoftBackend(run["backend"]), run["#threads"])
+        dsname = dataset_name(unit.fname)
+        times.setdefault(dsname, {"#Vertices": dsname.split("_")[-3]})
+        if plan_timeout(unit, times):
+            if PLACEMENT_CPUS is not None:
+                CURRENT_RUN.cores = PLACEMENT_CPUS[: unit.num_threads]
+            record_results(unit, times, run_unit(unit))
+
+    return times
+
+
+def compact_journal(args):
+    if args.journal.endswith(".db"):
+        # merge the results pushed by the workers
+        queue = work_queue.WorkQueue(args.journal)
+        logging.info("Run units: %s", queue.status())
+        records = queue.records()
+    elif os.path.isdir(args.journal):
+        # merge the partial results of the batch jobs
+        records = []
+        for fname in sorted(glob.glob(f"{args.journal}/*.jsonl")):
+            records += run_journal.read_journal(fname)
+    else:
+        records = run_journal.read_journal(args.journal)
+    times = run_journal.compact(records)
+    output = args.output
+    if output is None:
+        output = args.journal.rstrip("/").rsplit(".", 1)[0] + ".json"
+    with open(output, "w") as dst:
+        json.dump(times, dst, indent=4)
+    logging.info("Wrote results of %d datasets to %s", len(times), output)
+
+    # post-process the Gudhi diagrams generated by the workers or the
+    # batch jobs (once, after all of them)
+    gudhi_diag_inf.main()
+    return times
+
+
+def report_thread_scaling(args):
+    import thread_scaling
+
+    return thread_scaling.main(args.results, args.output, args.field)
+
+
+def scalability_study(args):
+    import scalability
+
+    create_dir("diagrams")
+    create_dir("logs")
+
+    # pylint: disable=W0603
+    global TIMEOUT_S
+    TIMEOUT_S = args.timeout
+    global SEQUENTIAL
+    SEQUENTIAL = args.sequential
+    global TIMEOUT_POLICY
+    TIMEOUT_POLICY = args.timeout_policy
+
+    fnames = scalability.generate_ladder(
+        args.sizes, args.fields, args.datasets, args.dest_dir
+    )
+    # smaller datasets first, to extrapolate the computation times
+    fnames.sort(key=lambda f: history.dataset_size(dataset_name(f))[1])
+
+    times = {}
+    for fname in fnames:
+        dsname = dataset_name(fname)
+        if dsname.split("_")[-3] not in [f"{s}x{s}x{s}" for s in args.sizes]:
+            continue
+        times.setdefault(dsname, {"#Vertices": dsname.split("_")[-3]})
+        dispatch(fname, times, args.backends)
+
+    with open(args.results, "w") as dst:
+        json.dump(times, dst, indent=4)
+
+    return scalability.main([args.results], args.output, args.target)
+
+
+def manage_cache(args):
+    cache = result_cache.ResultCache(args.cache_dir)
+    if args.action == "clear":
+        n = cache.invalidate()
+        logging.info("Removed %d cache entries", n)
+    elif args.action == "invalidate":
+        n = cache.invalidate(args.backend, args.dataset)
+        logging.info("Removed %d cache entries", n)
+    elif args.action == "evict":
+        cache.max_size = args.max_size * 1024 * 1024
+        cache.evict()
+        cache.save()
+    print(json.dumps(cache.stats(), indent=4))
+
+
 def compute_distances(args):
     import diagram_distance
 
@@ -930,47 +2072,407 @@ def main():
         help="Only generate 1D lines",
         action="store_true",
     )
+    prep_datasets.add_argument(
+        "--phat_ascii",
+        help="Write the PHAT boundary matrices in the ASCII format (not binary)",
+        action="store_true",
+    )
     prep_datasets.set_defaults(func=prepare_datasets)
 
-    get_diags = subparsers.add_parser("compute_diagrams")
-    get_diags.add_argument(
+    # options of the campaigns (compute_diagrams & plan)
+    campaign = argparse.ArgumentParser(add_help=False)
+    campaign.add_argument(
         "-s",
         "--sequential",
         help="Disable the multi-threading support",
         action="store_true",
     )
-    get_diags.add_argument(
+    campaign.add_argument(
+        "--threads",
+        help=(
+            "Thread-scaling sweep: comma-separated thread numbers of the "
+            "multi-threaded backends (e.g. 1,2,4,8)"
+        ),
+        type=lambda s: [int(n) for n in s.split(",")],
+    )
+    campaign.add_argument(
         "-t",
         "--timeout",
         help="Timeout in seconds of every persistence diagram computation",
         type=int,
         default=TIMEOUT_S,
     )
-    get_diags.add_argument(
+    campaign.add_argument(
+        "--timeout_policy",
+        help=(
+            "Runs predicted to reach the timeout (from the smaller datasets "
+            "of the campaign and from --history): run with the full timeout "
+            "(fixed), skip (skip) or run with a shortened timeout (shorten)"
+        ),
+        choices=["fixed", "skip", "shorten"],
+        default=TIMEOUT_POLICY,
+    )
+    campaign.add_argument(
         "-3",
         "--only_cubes",
         help="Only process 3D datasets",
         action="store_true",
     )
-    get_diags.add_argument(
+    campaign.add_argument(
         "-2",
         "--only_slices",
         help="Only process 2D datasets",
         action="store_true",
     )
-    get_diags.add_argument(
+    campaign.add_argument(
         "-1",
         "--only_lines",
         help="Only process 1D datasets",
         action="store_true",
     )
+    campaign.add_argument(
+        "--history",
+        help=(
+            "Results files of previous campaigns used to predict memory "
+            "peaks and computation times"
+        ),
+        nargs="*",
+        default=[],
+    )
+    campaign.add_argument(
+        "--sampling_rate",
+        help="Sampling rate (Hz) of the resources used by the backends",
+        type=float,
+        default=SAMPLING_RATE,
+    )
+    campaign.add_argument(
+        "--repeat",
+        help="Number of measured runs per backend and dataset (median reported)",
+        type=int,
+        default=REPEAT,
+    )
+    campaign.add_argument(
+        "--warmup",
+        help="Number of discarded runs before the measured ones",
+        type=int,
+        default=WARMUP,
+    )
+    campaign.add_argument(
+        "--placement",
+        help=(
+            "Placement of the runs on the CPUs: compact (fill a socket "
+            "first), scatter (round-robin over the sockets), physical "
+            "(no SMT sibling), numa (only one NUMA node)"
+        ),
+        type=placement.Placement,
+        choices=list(placement.Placement),
+        default=placement.Placement.NONE,
+    )
+    campaign.add_argument(
+        "--numa_node",
+        help="NUMA node of the numa placement",
+        type=int,
+        default=0,
+    )
+    campaign.add_argument(
+        "--python_startup",
+        help=(
+            "Start-up of the Python backends (Gudhi, Dionysus, Ripser, Oineus, "
+            "PHAT): a new interpreter for every run, measured with the run "
+            "(cold), or warm workers importing the libraries once, start-up "
+            "reported separately (steady)"
+        ),
+        choices=["cold", "steady"],
+        default="cold",
+    )
+    campaign.add_argument(
+        "--perf_counters",
+        help=(
+            "Count cycles, instructions, LLC misses, branch misses and "
+            "context switches of every backend run with perf stat"
+        ),
+        action="store_true",
+    )
+
+    get_diags = subparsers.add_parser("compute_diagrams", parents=[campaign])
     get_diags.add_argument(
         "-r",
         "--resume",
-        help="Resume computation from given file",
+        help=(
+            "Resume computation from given journal (.jsonl, appended to) "
+            "or results file (.json)"
+        ),
+    )
+    get_diags.add_argument(
+        "-j",
+        "--jobs",
+        help=(
+            "Maximum number of concurrent backend runs "
+            "(multi-threaded runs get exclusive cores)"
+        ),
+        type=int,
+        default=1,
+    )
+    get_diags.add_argument(
+        "-m",
+        "--mem_budget",
+        help=(
+            "Memory budget in MB: delay or skip the runs whose predicted "
+            "memory peak would exceed it"
+        ),
+        type=int,
+    )
+    get_diags.add_argument(
+        "-q",
+        "--queue",
+        help=(
+            "Publish the runs to this work queue (.db, on a shared "
+            "directory) instead of executing them (see `main.py worker`)"
+        ),
+    )
+    get_diags.add_argument(
+        "--scratch_dir",
+        help=(
+            "Directory (e.g. on a fast local filesystem) holding the "
+            "working directories of the backend runs (default: $TMPDIR)"
+        ),
+    )
+    get_diags.add_argument(
+        "-c",
+        "--cache",
+        help="Directory of the persistent results cache (disabled by default)",
+    )
+    get_diags.add_argument(
+        "--cache_size",
+        help="Size cap of the cached diagrams (MB)",
+        type=int,
+        default=100 * 1024,
     )
     get_diags.set_defaults(func=compute_diagrams)
 
+    compact = subparsers.add_parser("compact")
+    compact.add_argument(
+        "journal",
+        help=(
+            "Journal (.jsonl), work queue (.db) or batch jobs directory "
+            "of a campaign"
+        ),
+    )
+    compact.add_argument(
+        "-o", "--output", help="Output results file (default: journal name .json)"
+    )
+    compact.set_defaults(func=compact_journal)
+
+    worker = subparsers.add_parser("worker")
+    worker.add_argument("queue", help="Work queue of a campaign (.db)")
+    worker.add_argument("--name", help="Worker name (default: host.pid)")
+    worker.add_argument(
+        "--lease",
+        help="Lease duration (s) of the claimed runs, renewed while they run",
+        type=int,
+        default=300,
+    )
+    worker.add_argument(
+        "--poll",
+        help="Delay (s) between two claims when every run is leased",
+        type=int,
+        default=30,
+    )
+    worker.add_argument(
+        "--scratch_dir", help="Directory of the backends working directories"
+    )
+    worker.add_argument(
+        "--cpus",
+        help=(
+            "CPUs of this worker (e.g. 0-7), to run several workers on "
+            "disjoint cores of a node (default: every CPU of the placement)"
+        ),
+    )
+    worker.add_argument(
+        "-m",
+        "--mem_budget",
+        help=(
+            "Memory budget in MB of this worker: skip the runs whose "
+            "predicted memory peak would exceed it"
+        ),
+        type=int,
+    )
+    worker.set_defaults(func=run_worker)
+
+    plan = subparsers.add_parser("plan", parents=[campaign])
+    plan.add_argument(
+        "-b",
+        "--backends",
+        help="Only plan these backends (default: every backend)",
+        nargs="+",
+        choices=[b.value for b in SoftBackend],
+    )
+    plan.add_argument(
+        "-j",
+        "--jobs",
+        help="Maximum number of concurrent backend runs",
+        type=int,
+        default=1,
+    )
+    plan.add_argument(
+        "--cores",
+        help=(
+            "Number of CPU cores of the compute node, giving the thread "
+            "numbers of the parallel runs (default: this machine)"
+        ),
+        type=int,
+    )
+    plan.add_argument(
+        "-m",
+        "--mem_budget",
+        help="Memory budget in MB (default: RAM of this machine)",
+        type=int,
+    )
+    plan.add_argument(
+        "--disk_budget",
+        help="Disk budget in GB (default: free space of the current directory)",
+        type=float,
+    )
+    plan.add_argument(
+        "--emit",
+        help=(
+            "Also write the batch job array scripts of the converted datasets "
+            "(otherwise, only print the estimates)"
+        ),
+        choices=["pbs", "slurm"],
+    )
+    plan.add_argument(
+        "-w",
+        "--walltime",
+        help="Maximum walltime of a job ([[HH:]MM:]SS)",
+        default="24:00:00",
+    )
+    plan.add_argument(
+        "--mem_default",
+        help="Memory (MB) of the runs without history",
+        type=int,
+        default=16 * 1024,
+    )
+    plan.add_argument(
+        "--queue_name", help="Batch scheduler queue (PBS) or partition (Slurm)"
+    )
+    plan.add_argument(
+        "-o", "--out_dir", help="Directory of the job scripts", default="jobs"
+    )
+    plan.set_defaults(func=plan_campaign)
+
+    job = subparsers.add_parser("job")
+    job.add_argument("plan", help="Plan of the campaign (plan.json)")
+    job.add_argument("array", help="Index of the job array", type=int)
+    job.add_argument("index", help="Index of the job in its array", type=int)
+    job.add_argument(
+        "--scratch_dir", help="Directory of the backends working directories"
+    )
+    job.set_defaults(func=run_job)
+
+    scaling = subparsers.add_parser("thread_scaling")
+    scaling.add_argument("results", nargs="+", help="Results files")
+    scaling.add_argument(
+        "-o", "--output", help="Output report", default="thread_scaling.json"
+    )
+    scaling.add_argument(
+        "-f",
+        "--field",
+        help="Measured time field",
+        choices=["prec", "pers"],
+        default="pers",
+    )
+    scaling.set_defaults(func=report_thread_scaling)
+
+    scal = subparsers.add_parser("scalability")
+    scal.add_argument(
+        "-b",
+        "--backends",
+        help="Backends to study (default: every backend)",
+        nargs="+",
+        choices=[b.value for b in SoftBackend],
+    )
+    scal.add_argument(
+        "--sizes",
+        help="Comma-separated grid edge sizes of the ladder",
+        type=lambda s: [int(n) for n in s.split(",")],
+        default=[8, 16, 32, 64, 128, 256],
+    )
+    scal.add_argument(
+        "--fields",
+        help="Synthetic scalar fields",
+        nargs="*",
+        choices=["random", "elevation"],
+        default=["random", "elevation"],
+    )
+    scal.add_argument(
+        "-d",
+        "--datasets",
+        help="Real datasets (raws/*.raw) resampled at every size of the ladder",
+        nargs="*",
+        default=[],
+    )
+    scal.add_argument(
+        "--dest_dir", help="Directory of the ladder datasets", default="scalability"
+    )
+    scal.add_argument(
+        "-t",
+        "--timeout",
+        help="Timeout in seconds of every persistence diagram computation",
+        type=int,
+        default=TIMEOUT_S,
+    )
+    scal.add_argument(
+        "--timeout_policy",
+        help="Runs predicted to reach the timeout (see compute_diagrams)",
+        choices=["fixed", "skip", "shorten"],
+        default="skip",
+    )
+    scal.add_argument(
+        "-s",
+        "--sequential",
+        help="Disable the multi-threading support",
+        action="store_true",
+    )
+    scal.add_argument(
+        "--target",
+        help="Extrapolate the time and memory to this grid edge size",
+        type=int,
+        default=512,
+    )
+    scal.add_argument(
+        "--results",
+        help="Output results file (raw measurements)",
+        default="scalability_results.json",
+    )
+    scal.add_argument(
+        "-o", "--output", help="Output report", default="scalability.json"
+    )
+    scal.set_defaults(func=scalability_study)
+
+    cache = subparsers.add_parser("cache")
+    cache.add_argument(
+        "action",
+        help=(
+            "Print statistics, remove every entry, remove the entries "
+            "matching a backend/dataset or evict the oldest entries"
+        ),
+        choices=["stats", "clear", "invalidate", "evict"],
+    )
+    cache.add_argument("--cache_dir", help="Cache directory", default="cache")
+    cache.add_argument("-b", "--backend", help="Only invalidate this backend")
+    cache.add_argument(
+        "-d", "--dataset", help="Only invalidate datasets containing this string"
+    )
+    cache.add_argument(
+        "-s",
+        "--max_size",
+        help="Size cap of the cached diagrams (MB) when evicting",
+        type=int,
+        default=100 * 1024,
+    )
+    cache.set_defaults(func=manage_cache)
+
     get_dists = subparsers.add_parser("compute_distances")
     get_dists.set_defaults(func=compute_distances)
     get_dists.add_argument(
@@ -19,12 +19,14 @@ def main(input_dataset, output_diagram):
     pd = simple.TTKFG_PersistentHomology(Input=ds)
     pd.ScalarField = "ImageFile_Order"
     simple.UpdatePipeline()
-    shutil.move("/tmp/out.gudhi", output_diagram)
+    # written in the current (scratch) directory
+    shutil.move("out.gudhi", output_diagram)
 
 
 def set_env_and_run(thread_number):
     env = dict(os.environ)
-    prefix = f"{os.getcwd()}/build_dirs/install_paraview_v5.6.1"
+    root = os.path.dirname(os.path.abspath(__file__))
+    prefix = f"{root}/build_dirs/install_paraview_v5.6.1"
     env["PV_PLUGIN_PATH"] = f"{prefix}/lib/plugins"
     env["LD_LIBRARY_PATH"] = f"{prefix}/lib:" + os.environ.get("LD_LIBRARY_PATH", "")
     env["PYTHONPATH"] = ":".join(
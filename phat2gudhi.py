@@ -1,62 +1,204 @@
 import argparse
 import multiprocessing
 import os
-import re
 import subprocess
 import time
 
+import numpy as np
 
-def main(input_dataset, output_diagram, phat_exec, backend, thread_number):
+import history
+
+# size of the blocks of the boundary matrix read at once
+CHUNK_SIZE = 1 << 26
+# size of the blocks of lines converted at once into the binary format
+CONVERT_SIZE = 1 << 22
+
+
+def is_binary(input_dataset):
+    """If a boundary matrix is in the PHAT binary format (its number of
+    columns, a little-endian int64, has null bytes, unlike text)"""
+    with open(input_dataset, "rb") as src:
+        return b"\0" in src.read(8)
+
+
+def read_cell_dims(input_dataset):
+    """Dimension of every cell (column) of a boundary matrix in the PHAT
+    ASCII format, i.e. the first digit of every line, found with NumPy
+    on memory-mapped blocks of the file"""
+    buf = np.memmap(input_dataset, dtype=np.uint8, mode="r")
+    dims = []
+    line_start = True
+    for beg in range(0, len(buf), CHUNK_SIZE):
+        blk = np.asarray(buf[beg : beg + CHUNK_SIZE])
+        starts = np.flatnonzero(blk[:-1] == ord("\n")) + 1
+        if line_start:
+            starts = np.concatenate([[0], starts])
+        line_start = blk[-1] == ord("\n")
+        heads = blk[starts]
+        # skip comments
+        heads = heads[(heads >= ord("0")) & (heads <= ord("9"))]
+        dims.append((heads - ord("0")).astype(np.int8))
+    return np.concatenate(dims) if dims else np.empty(0, dtype=np.int8)
+
+
+def read_cell_dims_binary(input_dataset):
+    """Dimension of every cell of a boundary matrix in the PHAT binary
+    format. The columns have variable lengths and are walked one after
+    the other: slow, only used if the sidecar of the dataset is
+    missing"""
+    buf = np.memmap(input_dataset, dtype="<i8", mode="r")
+    n_cols = int(buf[0])
+    dims = np.empty(n_cols, dtype=np.int8)
+    pos = 1
+    for i in range(n_cols):
+        dims[i] = buf[pos]
+        pos += 2 + int(buf[pos + 1])
+    return dims
+
+
+def dims_sidecar(input_dataset):
+    """Path of the cell dimensions of a boundary matrix, next to the
+    dataset (hidden, so as not to be listed as a dataset)"""
+    path, name = os.path.split(input_dataset)
+    return os.path.join(path, f".{name}.dims.npy")
+
+
+def save_dims(input_dataset, dims):
+    sidecar = dims_sidecar(input_dataset)
+    tmp = f"{sidecar}.part"
+    try:
+        with open(tmp, "wb") as dst:
+            np.save(dst, dims)
+        os.replace(tmp, sidecar)
+    except OSError:
+        # read-only datasets directory
+        pass
+
+
+def cell_dims(input_dataset):
+    """Cell dimensions of a boundary matrix, cached in a sidecar .npy
+    file, re-computed if older than the dataset"""
+    sidecar = dims_sidecar(input_dataset)
+    try:
+        if os.stat(sidecar).st_mtime_ns >= os.stat(input_dataset).st_mtime_ns:
+            return np.load(sidecar)
+    except (OSError, ValueError):
+        pass
+    if is_binary(input_dataset):
+        dims = read_cell_dims_binary(input_dataset)
+    else:
+        dims = read_cell_dims(input_dataset)
+    save_dims(input_dataset, dims)
+    return dims
+
+
+def encode_columns(lines):
+    """Columns of a block of lines of the PHAT ASCII format, encoded in
+    the PHAT binary format (dimension, number of rows, sorted rows)"""
+    vals = np.fromstring(lines, dtype=np.int64, sep=" ")
+    buf = np.frombuffer(lines, dtype=np.uint8)
+    digit = (buf >= ord("0")) & (buf <= ord("9"))
+    # first digit of every number and line it belongs to
+    tok_pos = np.flatnonzero(digit & ~np.concatenate([[False], digit[:-1]]))
+    tok_line = np.searchsorted(np.flatnonzero(buf == ord("\n")), tok_pos)
+    first = np.ones(len(vals), dtype=bool)
+    first[1:] = tok_line[1:] != tok_line[:-1]
+    starts = np.flatnonzero(first)
+    n_rows = np.diff(np.append(starts, len(vals))) - 1
+    # every column gets one more value (its number of rows)
+    col = np.cumsum(first) - 1
+    # PHAT does not sort the rows of the loaded columns
+    vals = vals[np.lexsort((vals, ~first, col))]
+    out = np.empty(len(vals) + len(starts), dtype="<i8")
+    out[np.arange(len(vals)) + col + ~first] = vals
+    out[starts + np.arange(len(starts)) + 1] = n_rows
+    return out, vals[starts].astype(np.int8)
+
+
+def to_binary(input_dataset):
+    """Convert in place a boundary matrix from the PHAT ASCII format to
+    the PHAT binary format, by blocks of lines. The cell dimensions
+    sidecar is written on the way.
+
+    Returns the sizes (bytes) of the ASCII and of the binary files
+    """
+    ascii_size = os.path.getsize(input_dataset)
+    tmp = f"{input_dataset}.part"
+    n_cols = 0
+    dims = []
+    with open(input_dataset, "rb") as src, open(tmp, "wb") as dst:
+        # number of columns, known at the end
+        dst.write(np.int64(0).astype("<i8").tobytes())
+        while True:
+            lines = src.read(CONVERT_SIZE)
+            if not lines:
+                break
+            lines += src.readline()
+            cols, cdims = encode_columns(lines)
+            cols.tofile(dst)
+            dims.append(cdims)
+            n_cols += len(cdims)
+        dst.seek(0)
+        dst.write(np.int64(n_cols).astype("<i8").tobytes())
+    os.replace(tmp, input_dataset)
+    save_dims(input_dataset, np.concatenate(dims) if dims else np.empty(0, np.int8))
+    return ascii_size, os.path.getsize(input_dataset)
+
+
+def read_pairs(phat_diag, binary=False):
+    """Pairs (birth and death columns) of a PHAT pairs file, as an array
+    of shape (n, 2)"""
+    if binary:
+        vals = np.fromfile(phat_diag, dtype="<i8")
+    else:
+        vals = np.fromfile(phat_diag, dtype=np.int64, sep=" ")
+    if len(vals) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    n_pairs = int(vals[0])
+    return vals[1 : 2 * n_pairs + 1].reshape(-1, 2)
+
+
+def main(input_dataset, output_diagram, phat_exec, backend, thread_number, binary=None):
     # call PHAT on input dataset
     phat_diag = "diagram.phat"
+    if binary is None:
+        binary = is_binary(input_dataset)
 
     env = dict(os.environ)
     env["OMP_NUM_THREADS"] = str(thread_number)
 
+    # same format for the input boundary matrix and the output pairs
     subprocess.check_call(
-        [phat_exec, "--verbose", "--ascii", f"--{backend}"]
+        [phat_exec, "--verbose", "--binary" if binary else "--ascii", f"--{backend}"]
         + [input_dataset, phat_diag],
         env=env,
     )
 
     start = time.time()
 
-    patt = re.compile(r".*_(\d+)x(\d+)x(\d+)_.*")
-    dims = [int(a) for a in re.match(patt, input_dataset).groups()]
-    max_death = dims[0] * dims[1] * dims[2] - 1
-
-    # read PHAT persistence_pairs binary format file
-    with open(phat_diag) as src:
-        n_pairs = int(src.readline())
-        pairs = []
-        for i, line in enumerate(src):
-            pairs.append([int(a) for a in line.split(" ")])
-            if i == n_pairs:
-                break
+    max_death = history.dataset_size(os.path.basename(input_dataset))[0] - 1
+
+    # read PHAT persistence_pairs file
+    pairs = read_pairs(phat_diag, binary)
     os.remove(phat_diag)
 
-    # get offset, dim from input_dataset
-    with open(input_dataset) as src:
-        n_verts = -1
-        offsets = []
-        dims = []
-        for i, line in enumerate(src):
-            if line.startswith("0"):
-                n_verts += 1
-            offsets.append(n_verts)
-            dims.append(int(line.strip().split()[0]))
+    # dimension and vertex (last vertex before) of every cell
+    dims = cell_dims(input_dataset)
+    offsets = np.cumsum(dims == 0, dtype=np.int64) - 1
+
+    ob = offsets[pairs[:, 0]]
+    od = offsets[pairs[:, 1]]
+    dim = dims[pairs[:, 0]]
+    keep = ob != od
+    # fix death of global min-max pair
+    od[(dim == 0) & (ob == 0) & (od == 1)] = max_death
+    rows = np.column_stack([dim, ob, od])[keep]
 
     # write pairs in Gudhi format
     with open(output_diagram, "w") as dst:
-        for birth, death in pairs:
-            ob = offsets[birth]
-            od = offsets[death]
-            dim = dims[birth]
-            if ob != od:
-                # fix death of global min-max pair
-                if dim == 0 and ob == 0 and od == 1:
-                    od = max_death
-                dst.write(f"{dim} {ob} {od}\n")
+        for beg in range(0, len(rows), 1 << 20):
+            blk = rows[beg : beg + (1 << 20)].tolist()
+            dst.write("".join(f"{d} {b} {e}\n" for d, b, e in blk))
 
     print(f"Converted PHAT pairs to Gudhi format (took {time.time() - start:.3f}s)")
 
@@ -97,12 +239,27 @@ if __name__ == "__main__":
         help="Number of threads",
         default=multiprocessing.cpu_count(),
     )
+    fmt = parser.add_mutually_exclusive_group()
+    fmt.add_argument(
+        "--binary",
+        action="store_true",
+        help="Input dataset in the PHAT binary format (default: detected)",
+    )
+    fmt.add_argument(
+        "--ascii",
+        action="store_true",
+        help="Input dataset in the PHAT ASCII format (default: detected)",
+    )
 
     args = parser.parse_args()
+    binary = None
+    if args.binary or args.ascii:
+        binary = args.binary
     main(
         args.input_dataset,
         args.output_diagram,
         args.phat_exec,
         args.backend,
         args.thread_number,
+        binary,
     )
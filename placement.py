@@ -0,0 +1,126 @@
+import enum
+import glob
+import os
+import re
+
+SYSFS_CPU = "/sys/devices/system/cpu"
+SYSFS_NODE = "/sys/devices/system/node"
+
+
+def parse_cpulist(txt):
+    """Parse a Linux CPU list ("0-3,8,10-11") into a list of integers"""
+    cpus = []
+    for part in txt.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            beg, end = part.split("-")
+            cpus.extend(range(int(beg), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def format_cpulist(cpus):
+    """Compact representation of a list of CPUs ("0-3,8")"""
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(f"{a}-{b}" if a != b else str(a) for a, b in ranges)
+
+
+def _read(path, default=None):
+    try:
+        with open(path) as src:
+            return src.read().strip()
+    except OSError:
+        return default
+
+
+class CPU:
+    """A hardware thread with its position in the machine topology"""
+
+    def __init__(self, cpu, package, core, node, smt_rank):
+        self.cpu = cpu
+        self.package = package
+        self.core = core
+        self.node = node
+        # 0 for the first hardware thread of a physical core
+        self.smt_rank = smt_rank
+
+
+def read_topology():
+    """Topology of the CPUs this process may run on, from sysfs"""
+    allowed = os.sched_getaffinity(0)
+    node_of = {}
+    for node_dir in glob.glob(f"{SYSFS_NODE}/node[0-9]*"):
+        node = int(re.search(r"node(\d+)$", node_dir).group(1))
+        for cpu in parse_cpulist(_read(f"{node_dir}/cpulist", "")):
+            node_of[cpu] = node
+
+    cpus = []
+    for cpu in sorted(allowed):
+        topo = f"{SYSFS_CPU}/cpu{cpu}/topology"
+        package = int(_read(f"{topo}/physical_package_id", 0))
+        core = int(_read(f"{topo}/core_id", cpu))
+        siblings = parse_cpulist(_read(f"{topo}/thread_siblings_list", str(cpu)))
+        smt_rank = sorted(siblings).index(cpu) if cpu in siblings else 0
+        cpus.append(CPU(cpu, package, core, node_of.get(cpu, 0), smt_rank))
+    return cpus
+
+
+class Placement(enum.Enum):
+    NONE = "none"  # no pinning (unless co-scheduled runs)
+    COMPACT = "compact"  # fill a socket (SMT siblings included) first
+    SCATTER = "scatter"  # round-robin over the sockets, physical cores first
+    PHYSICAL = "physical"  # one hardware thread per physical core
+    NUMA = "numa"  # only the cores of one NUMA node
+
+    def __str__(self):
+        return self.value
+
+    def order_cpus(self, topology, numa_node=0):
+        """Ordered list of the CPUs the reservations are taken from
+        (the first n CPUs are used by a run with n threads)"""
+        if self == Placement.NONE:
+            return [c.cpu for c in topology]
+        if self == Placement.COMPACT:
+            key = lambda c: (c.package, c.core, c.smt_rank)
+        elif self == Placement.SCATTER:
+            # rank of the core inside its package
+            cores = {}
+            for c in topology:
+                cores.setdefault(c.package, [])
+                if c.core not in cores[c.package]:
+                    cores[c.package].append(c.core)
+            key = lambda c: (c.smt_rank, cores[c.package].index(c.core), c.package)
+        elif self == Placement.PHYSICAL:
+            topology = [c for c in topology if c.smt_rank == 0]
+            key = lambda c: (c.package, c.core)
+        elif self == Placement.NUMA:
+            topology = [c for c in topology if c.node == numa_node]
+            key = lambda c: (c.smt_rank, c.core)
+        return [c.cpu for c in sorted(topology, key=key)]
+
+    def omp_env(self, cpus):
+        """OpenMP environment variables binding the threads to the
+        reserved CPUs"""
+        if self == Placement.NONE:
+            return {}
+        return {
+            "OMP_PLACES": ",".join(f"{{{c}}}" for c in cpus),
+            "OMP_PROC_BIND": "spread" if self == Placement.SCATTER else "close",
+        }
+
+    def mpirun_options(self, cpus):
+        """Open MPI binding options for the reserved CPUs"""
+        opts = ["--cpu-set", ",".join(str(c) for c in cpus)]
+        if self == Placement.PHYSICAL:
+            return opts + ["--bind-to", "core", "--map-by", "core"]
+        opts += ["--use-hwthread-cpus", "--bind-to", "hwthread"]
+        if self == Placement.SCATTER:
+            return opts + ["--map-by", "socket"]
+        return opts
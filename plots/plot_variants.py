@@ -30,7 +30,7 @@ def transpose_data(data, dim, mode="seq"):
 
             if mode in perfs:
                 val = perfs[mode]["pers"]
-            elif "timeout" in perfs:
+            elif "timeout" in perfs and perfs["timeout"] != "predicted":
                 val = perfs["timeout"]
             else:
                 continue
@@ -39,7 +39,7 @@ def transpose_data(data, dim):
                 val = perfs["para"]["pers"]
             elif "seq" in perfs:
                 val = perfs["seq"]["pers"]
-            elif "timeout" in perfs:
+            elif "timeout" in perfs and perfs["timeout"] != "predicted":
                 val = perfs["timeout"]
             else:
                 continue
@@ -72,7 +72,11 @@ def generate_dat(data, dim, pref_mode="para"):
             continue
         for bk in backends:
             perfs = res[bk]
-            if "error" in perfs:
+            if (
+                "error" in perfs
+                or "skipped" in perfs
+                or perfs.get("timeout") == "predicted"
+            ):
                 val = 0.0
             elif pref_mode in perfs:
                 val = perfs[pref_mode]["pers"]
@@ -70,6 +70,8 @@ def gen_table(fname, res, simplicial=True):
                     val = val["para"]["pers"]
                 elif "seq" in val.keys():
                     val = val["seq"]["pers"]
+                elif val.get("timeout") == "predicted":
+                    val = r"\cellcolor{lightgray}{Pred.}"
                 elif "timeout" in val.keys():
                     if val["timeout"] > 60 :
                         timeout = int(val["timeout"] / 60)
@@ -78,6 +80,8 @@ def gen_table(fname, res, simplicial=True):
                         timeout = val["timeout"]
                         timeout = f"+{timeout}s"
                     val = r"\cellcolor{lightgray}%s" % timeout
+                elif "skipped" in val.keys():
+                    val = r"\cellcolor{lightgray}{Skip.}"
                 else:
                     val = r"\cellcolor{lightgray}{Err.}"
             curr[cols_dict[it]] = str(val)
@@ -0,0 +1,92 @@
+import asyncio
+import subprocess
+import threading
+
+CHUNK_SIZE = 1 << 16
+
+
+async def drain(stream, chunks, log=None):
+    """Read a pipe until EOF, keeping its content and copying it to a
+    log file as it arrives"""
+    while True:
+        chunk = await stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if log is not None:
+            log.write(chunk)
+            log.flush()
+
+
+def decode(chunks):
+    # same as universal_newlines=True
+    txt = b"".join(chunks).decode(errors="replace")
+    return txt.replace("\r\n", "\n").replace("\r", "\n")
+
+
+async def run_process(cmd, timeout, logs=(None, None), **kwargs):
+    """Run a process, draining its stdout and stderr concurrently (into
+    the given log files, opened in binary mode) so that it never stalls
+    on a full pipe.
+
+    Returns (stdout, stderr) as text, raises subprocess.TimeoutExpired
+    or subprocess.CalledProcessError like subprocess.run
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        **kwargs,
+    )
+    out, err = [], []
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(
+                drain(proc.stdout, out, logs[0]),
+                drain(proc.stderr, err, logs[1]),
+                proc.wait(),
+            ),
+            timeout,
+        )
+    except asyncio.TimeoutError:
+        proc.terminate()
+        try:
+            await asyncio.wait_for(proc.wait(), 10)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+        raise subprocess.TimeoutExpired(cmd, timeout, decode(out), decode(err))
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(
+            proc.returncode, cmd, decode(out), decode(err)
+        )
+    return decode(out), decode(err)
+
+
+class Supervisor:
+    """Event loop, in a background thread, supervising the processes
+    launched by every (scheduler) thread"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def run(self, cmd, timeout, logs=(None, None), **kwargs):
+        """Blocking call of run_process from any thread"""
+        future = asyncio.run_coroutine_threadsafe(
+            run_process(cmd, timeout, logs, **kwargs), self.loop
+        )
+        return future.result()
+
+
+_SUPERVISOR = None
+_LOCK = threading.Lock()
+
+
+def get_supervisor():
+    global _SUPERVISOR  # pylint: disable=W0603
+    with _LOCK:
+        if _SUPERVISOR is None:
+            _SUPERVISOR = Supervisor()
+        return _SUPERVISOR
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import shutil
+import threading
+import time
+
+import diagram_store
+
+
+def sha256sum(fname, chunk_size=1 << 20):
+    """SHA-256 of a file content, "missing" if it does not exist"""
+    h = hashlib.sha256()
+    try:
+        with open(fname, "rb") as src:
+            for chunk in iter(lambda: src.read(chunk_size), b""):
+                h.update(chunk)
+    except FileNotFoundError:
+        return "missing"
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Persistent cache of backend runs (timings and diagram), indexed
+    by the hash of the input file, the backend, the number of threads,
+    the hash of the backend executables and the run parameters
+    (timeout, repetitions...).
+
+    Layout: one sub-directory per entry holding `result.json` and a copy
+    of the diagram with its binary store (see diagram_store.py), plus an `index.json` file used for the LRU eviction
+    and `hashes.json` to avoid re-hashing unmodified input files.
+    """
+
+    def __init__(self, cache_dir="cache", max_size_mb=None):
+        self.dir = pathlib.Path(cache_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = None if max_size_mb is None else max_size_mb * 1024 * 1024
+        self.lock = threading.RLock()
+        self.index = self._load("index.json")
+        self.hashes = self._load("hashes.json")
+
+    def _load(self, name):
+        try:
+            with open(self.dir / name) as src:
+                return json.load(src)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save(self, name, data):
+        tmp = self.dir / f"{name}.tmp"
+        with open(tmp, "w") as dst:
+            json.dump(data, dst, indent=4)
+        os.replace(tmp, self.dir / name)
+
+    def file_hash(self, fname):
+        """Hash of a file, re-computed only if its size or modification
+        time changed"""
+        st = os.stat(fname)
+        stamp = [st.st_size, st.st_mtime_ns]
+        path = str(pathlib.Path(fname).resolve())
+        with self.lock:
+            entry = self.hashes.get(path)
+            if entry is not None and entry["stamp"] == stamp:
+                return entry["sha256"]
+        digest = sha256sum(fname)
+        with self.lock:
+            self.hashes[path] = {"stamp": stamp, "sha256": digest}
+            self._save("hashes.json", self.hashes)
+        return digest
+
+    def key(self, input_file, backend, num_threads, executables, params):
+        h = hashlib.sha256()
+        h.update(self.file_hash(input_file).encode())
+        h.update(backend.encode())
+        h.update(str(num_threads).encode())
+        for exe in executables:
+            if os.path.exists(exe):
+                h.update(self.file_hash(exe).encode())
+            else:
+                h.update(f"missing:{exe}".encode())
+        h.update(json.dumps(params, sort_keys=True).encode())
+        return h.hexdigest()
+
+    def get(self, key, diagram):
+        """Stored results of a cache entry (and copy its diagram and its
+        binary store to the given path), None on cache miss"""
+        with self.lock:
+            entry = self.index.get(key)
+            if entry is None:
+                return None
+            edir = self.dir / key
+            try:
+                with open(edir / "result.json") as src:
+                    res = json.load(src)
+                if entry.get("diagram") is not None:
+                    shutil.copyfile(edir / entry["diagram"], diagram)
+                store = diagram_store.store_file(diagram)
+                if entry.get("store") is not None:
+                    # copied after the diagram: more recent, thus fresh
+                    shutil.copyfile(edir / entry["store"], store)
+                elif os.path.exists(store):
+                    # left by a previous run
+                    os.remove(store)
+            except (OSError, json.JSONDecodeError):
+                logging.warning("Corrupted cache entry %s, discarding it", key)
+                self._remove(key)
+                return None
+            entry["last_used"] = time.time()
+            self.save()
+            return res
+
+    def put(self, key, res, diagram, meta):
+        """Store the results and the diagram of a backend run"""
+        with self.lock:
+            edir = self.dir / key
+            edir.mkdir(exist_ok=True)
+            with open(edir / "result.json", "w") as dst:
+                json.dump(res, dst, indent=4)
+            entry = dict(meta, size=0, diagram=None, store=None, last_used=time.time())
+            if os.path.exists(diagram):
+                name = os.path.basename(diagram)
+                shutil.copyfile(diagram, edir / name)
+                entry.update(diagram=name, size=os.path.getsize(edir / name))
+                store = diagram_store.find(diagram)
+                if store is not None:
+                    name = os.path.basename(store)
+                    shutil.copyfile(store, edir / name)
+                    entry.update(store=name)
+                    entry["size"] += os.path.getsize(edir / name)
+            self.index[key] = entry
+            self.evict()
+            self.save()
+
+    def save(self):
+        with self.lock:
+            self._save("index.json", self.index)
+
+    def _remove(self, key):
+        shutil.rmtree(self.dir / key, ignore_errors=True)
+        self.index.pop(key, None)
+
+    def size(self):
+        return sum(e["size"] for e in self.index.values())
+
+    def evict(self):
+        """Remove the least recently used entries above the size cap"""
+        if self.max_size is None:
+            return
+        with self.lock:
+            lru = sorted(self.index, key=lambda k: self.index[k]["last_used"])
+            while lru and self.size() > self.max_size:
+                key = lru.pop(0)
+                logging.info("Evicting cache entry %s", key)
+                self._remove(key)
+
+    def invalidate(self, backend=None, dataset=None):
+        """Remove the entries matching a backend and/or a dataset name
+        (every entry without filter). Returns the number of entries
+        removed."""
+        with self.lock:
+            keys = [
+                k
+                for k, e in self.index.items()
+                if (backend is None or e.get("backend") == backend)
+                and (dataset is None or dataset in e.get("dataset", ""))
+            ]
+            for key in keys:
+                self._remove(key)
+            self.save()
+            return len(keys)
+
+    def stats(self):
+        backends = {}
+        for entry in self.index.values():
+            backends[entry.get("backend")] = backends.get(entry.get("backend"), 0) + 1
+        return {
+            "entries": len(self.index),
+            "size (MB)": round(self.size() / 1024 / 1024, 1),
+            "entries per backend": backends,
+        }
@@ -0,0 +1,33 @@
+import random
+import statistics
+
+
+def quantile(vals, q):
+    """Quantile of a list of values (linear interpolation between the
+    closest ranks)"""
+    vals = sorted(vals)
+    pos = (len(vals) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(vals) - 1)
+    return vals[lo] + (vals[hi] - vals[lo]) * (pos - lo)
+
+
+def bootstrap_ci(vals, conf=0.95, n_resamples=1000, seed=0):
+    """Percentile bootstrap confidence interval of the median"""
+    rng = random.Random(seed)
+    medians = [
+        statistics.median(rng.choices(vals, k=len(vals))) for _ in range(n_resamples)
+    ]
+    alpha = (1.0 - conf) / 2.0
+    return [quantile(medians, alpha), quantile(medians, 1.0 - alpha)]
+
+
+def summarize(vals, ndigits=3):
+    """Median, minimum, inter-quartile range and 95% bootstrap
+    confidence interval of the median of a series of measurements"""
+    return {
+        "median": round(statistics.median(vals), ndigits),
+        "min": round(min(vals), ndigits),
+        "iqr": round(quantile(vals, 0.75) - quantile(vals, 0.25), ndigits),
+        "ci95": [round(v, ndigits) for v in bootstrap_ci(vals)],
+    }
@@ -0,0 +1,73 @@
+import json
+import logging
+import os
+import threading
+
+
+def ends_with_newline(fname):
+    """Whether a file is missing, empty or ends with a newline (and not
+    with a line truncated by an interrupted campaign)"""
+    try:
+        with open(fname, "rb") as src:
+            if src.seek(0, os.SEEK_END) == 0:
+                return True
+            src.seek(-1, os.SEEK_END)
+            return src.read(1) == b"\n"
+    except FileNotFoundError:
+        return True
+
+
+class RunJournal:
+    """Append-only JSON Lines journal with one record per completed
+    backend run, synced to disk as soon as the run completes"""
+
+    def __init__(self, fname):
+        self.fname = fname
+        self.lock = threading.Lock()
+        # the existing journal was checked before the first append
+        self.checked = False
+
+    def append(self, record):
+        line = json.dumps(record) + "\n"
+        with self.lock:
+            if not self.checked:
+                if not ends_with_newline(self.fname):
+                    # terminate the truncated line, ignored when read
+                    line = "\n" + line
+                self.checked = True
+            with open(self.fname, "a") as dst:
+                dst.write(line)
+                dst.flush()
+                os.fsync(dst.fileno())
+
+
+def read_journal(fname):
+    """List of the records of a journal (a truncated last line, from an
+    interrupted campaign, is ignored)"""
+    records = []
+    with open(fname) as src:
+        for i, line in enumerate(src):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                logging.warning("Ignoring corrupted line %d of %s", i + 1, fname)
+    return records
+
+
+def compact(records, times=None):
+    """Rebuild the nested results table (dataset -> backend -> mode)
+    from journal records"""
+    if times is None:
+        times = {}
+    for rec in records:
+        ds = times.setdefault(rec["dataset"], {"#Vertices": rec["#Vertices"]})
+        for backend, res in rec["results"].items():
+            ds.setdefault(backend, {}).update(res)
+    return times
+
+
+def done_cells(records):
+    """Set of the (dataset, backend, mode) runs present in a journal"""
+    return {(rec["dataset"], rec["backend"], rec["mode"]) for rec in records}
@@ -0,0 +1,191 @@
+import argparse
+import glob
+import json
+import math
+import multiprocessing
+import os
+import pathlib
+
+import history
+
+# pylint: disable=import-outside-toplevel
+
+
+def dataset_prefix(raw_file):
+    """Name of the generated datasets of a raw file ("foo" for
+    "foo_256x256x256_uint8.raw", "random" for "random.vti")"""
+    stem = pathlib.Path(raw_file).name.split(".")[0]
+    parts = stem.split("_")
+    if len(parts) > 2:
+        return "_".join(parts[:-2])
+    return stem
+
+
+def convert(raw_file, size, dest_dir):
+    import convert_datasets
+    from convert_datasets import SliceType
+
+    ext = f"{size}x{size}x{size}"
+    if glob.glob(f"{dest_dir}/{dataset_prefix(raw_file)}_{ext}_order_*"):
+        return
+    # reduce RAM usage by isolating datasets manipulation in separate
+    # processes
+    p = multiprocessing.Process(
+        target=convert_datasets.main,
+        args=(raw_file, dest_dir, size, SliceType.VOL),
+    )
+    p.start()
+    p.join()
+
+
+def generate_ladder(sizes, fields, raw_files, dest_dir="scalability"):
+    """Generate 3D datasets of every size of the ladder from synthetic
+    fields (random, elevation) and from real datasets (resampled).
+
+    Returns the list of the generated dataset files
+    """
+    import gen_random
+
+    for size in sizes:
+        for field in fields:
+            # synthetic fields are generated at the ladder size
+            raws_dir = f"{dest_dir}/raws/{size}"
+            os.makedirs(raws_dir, exist_ok=True)
+            if not os.path.exists(f"{raws_dir}/{field}.vti"):
+                gen_random.main(size, field, raws_dir)
+            convert(f"{raws_dir}/{field}.vti", size, dest_dir)
+        for raw_file in raw_files:
+            convert(raw_file, size, dest_dir)
+
+    return sorted(f for f in glob.glob(f"{dest_dir}/*_order_*") if os.path.isfile(f))
+
+
+def get_points(times, backend):
+    """Measured points of a backend: number of simplices (or cells),
+    number of pairs, computation time and memory peak"""
+    points = []
+    for dsname, backends in times.items():
+        perfs = backends.get(backend)
+        if not isinstance(perfs, dict):
+            continue
+        for mode, res in perfs.items():
+            if not isinstance(res, dict) or "pers" not in res:
+                continue
+            points.append(
+                {
+                    "dataset": dsname,
+                    "field": "_".join(dsname.split("_")[:-3]),
+                    "complex": dsname.split("_")[-1],
+                    "mode": mode,
+                    "#Simplices": history.dataset_size(dsname)[1],
+                    "#Pairs": res.get("#Total pairs", 0),
+                    "time": round(res.get("prec", 0.0) + res["pers"], 3),
+                    "mem": res.get("mem", 0),
+                }
+            )
+    return points
+
+
+def fit_exponent(points, xfield, yfield):
+    """Empirical complexity y = c * x^k (least squares in log-log
+    scale), None with less than two different x values"""
+    samples = [(p[xfield], p[yfield]) for p in points]
+    samples = [(x, y) for x, y in samples if x > 0 and y > 0]
+    if len({x for x, _ in samples}) < 2:
+        return None
+    c, k = history.fit_power_law(samples)
+    # coefficient of determination in log-log scale
+    ly = [math.log(y) for _, y in samples]
+    my = sum(ly) / len(ly)
+    ss_tot = sum((y - my) ** 2 for y in ly)
+    ss_res = sum((math.log(y) - math.log(c) - k * math.log(x)) ** 2 for x, y in samples)
+    return {
+        "exponent": round(k, 3),
+        "coefficient": c,
+        "r2": round(1.0 - ss_res / ss_tot, 3) if ss_tot > 0 else 1.0,
+        "#points": len(samples),
+    }
+
+
+def fit_points(points, target=None):
+    fits = {}
+    for xfield in ["#Simplices", "#Pairs"]:
+        for yfield in ["time", "mem"]:
+            fits[f"{yfield}/{xfield}"] = fit_exponent(points, xfield, yfield)
+    if target is not None:
+        # extrapolation to a larger grid
+        ext = f"{target}x{target}x{target}"
+        size = history.dataset_size(f"target_{ext}_order_{points[0]['complex']}")[1]
+        fits["prediction"] = {"#Simplices": size}
+        for yfield in ["time", "mem"]:
+            fit = fits[f"{yfield}/#Simplices"]
+            if fit is not None:
+                pred = fit["coefficient"] * size ** fit["exponent"]
+                fits["prediction"][yfield] = round(pred, 3)
+    return fits
+
+
+def complexity_report(times, target=None):
+    """Complexity exponents of the computation time and of the memory
+    peak against the number of simplices and the number of pairs, per
+    backend, complex type and run mode (over every field and per field)
+    """
+    report = {}
+    for backend in sorted({b for res in times.values() for b in res}):
+        points = get_points(times, backend)
+        if not points:
+            continue
+        groups = {}
+        for p in points:
+            groups.setdefault(f"{p['complex']}/{p['mode']}", []).append(p)
+        fits = {}
+        for group, pts in sorted(groups.items()):
+            fits[group] = {"all": fit_points(pts, target)}
+            for field in sorted({p["field"] for p in pts}):
+                fpts = [p for p in pts if p["field"] == field]
+                fits[group][field] = fit_points(fpts, target)
+        report[backend] = {"fits": fits, "points": points}
+    return report
+
+
+def print_summary(report):
+    for backend, res in report.items():
+        for group, fits in res["fits"].items():
+            fit = fits["all"]
+            exps = []
+            for key in ["time/#Simplices", "mem/#Simplices", "time/#Pairs"]:
+                if fit[key] is not None:
+                    exps.append(f"{key} ^{fit[key]['exponent']}")
+            print(f"{backend} ({group}): {', '.join(exps)}")
+            pred = fit.get("prediction")
+            if pred is not None and "time" in pred:
+                print(
+                    f"  predicted for {pred['#Simplices']} simplices: "
+                    f"{pred['time']}s, {pred.get('mem', '?')}MB"
+                )
+
+
+def main(results, output="scalability.json", target=None):
+    times = history.load_results(results)
+    report = complexity_report(times, target)
+    with open(output, "w") as dst:
+        json.dump(report, dst, indent=4)
+    print_summary(report)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Empirical complexity exponents of the backends"
+    )
+    parser.add_argument("results", nargs="+", help="Results files")
+    parser.add_argument(
+        "-o", "--output", help="Output report", default="scalability.json"
+    )
+    parser.add_argument(
+        "--target",
+        help="Extrapolate the time and memory to this grid edge size",
+        type=int,
+    )
+    args = parser.parse_args()
+    main(args.results, args.output, args.target)
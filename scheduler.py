@@ -0,0 +1,131 @@
+import concurrent.futures
+import heapq
+import logging
+import os
+import threading
+
+
+def available_cores():
+    """Sorted list of the CPU cores this process is allowed to run on"""
+    return sorted(os.sched_getaffinity(0))
+
+
+class CorePool:
+    """Book-keeping of the CPU cores reserved by the concurrent runs.
+
+    Multi-threaded runs get an exclusive reservation of as many cores
+    as they use threads, single-threaded runs get one core each. The
+    total number of concurrent runs is bounded by `max_jobs`. With a
+    memory budget (MB), the sum of the predicted memory peaks of the
+    concurrent runs stays below it.
+    """
+
+    def __init__(self, cores, max_jobs, mem_budget=None):
+        self.free = list(cores)
+        # position of every core in the placement order
+        self.rank = {c: i for i, c in enumerate(self.free)}
+        self.total = len(self.free)
+        self.max_jobs = max_jobs
+        self.running = 0
+        self.mem_budget = mem_budget
+        self.mem_used = 0
+        self.cond = threading.Condition()
+
+    def _can_start(self, num_cores, mem):
+        return (
+            len(self.free) >= num_cores
+            and self.running < self.max_jobs
+            and (
+                self.mem_budget is None
+                or self.running == 0
+                or self.mem_used + mem <= self.mem_budget
+            )
+        )
+
+    def acquire(self, num_cores, mem=0):
+        # never ask for more cores than the pool contains
+        num_cores = max(1, min(num_cores, self.total))
+        with self.cond:
+            self.cond.wait_for(lambda: self._can_start(num_cores, mem))
+            cores = self.free[:num_cores]
+            del self.free[:num_cores]
+            self.running += 1
+            self.mem_used += mem
+            return cores
+
+    def release(self, cores, mem=0):
+        with self.cond:
+            self.free = sorted(self.free + cores, key=self.rank.__getitem__)
+            self.running -= 1
+            self.mem_used -= mem
+            self.cond.notify_all()
+
+
+def run_concurrently(
+    units, run_func, max_jobs, cores=None, mem_budget=None, admit=None
+):
+    """Execute `run_func(unit, cores)` on every unit, packing them on
+    disjoint core sets.
+
+    Units are started in the given order (a unit waiting for a large
+    reservation blocks the following ones, so that multi-threaded runs
+    are not starved by a stream of single-threaded ones). Every unit
+    should expose a `num_threads` attribute.
+
+    `admit(unit)` is called just before a unit is scheduled and returns
+    the memory (MB) to reserve for it, or None to skip the unit.
+    """
+
+    if cores is None:
+        cores = available_cores()
+    pool = CorePool(cores, max_jobs, mem_budget)
+
+    def task(unit, reserved, mem):
+        try:
+            run_func(unit, reserved)
+        finally:
+            pool.release(reserved, mem)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_jobs) as executor:
+        futures = []
+        for unit in units:
+            mem = 0
+            if admit is not None:
+                mem = admit(unit)
+                if mem is None:
+                    continue
+            reserved = pool.acquire(unit.num_threads, mem)
+            logging.debug("Reserved cores %s and %sMB for %s", reserved, mem, unit)
+            futures.append(executor.submit(task, unit, reserved, mem))
+        for fut in concurrent.futures.as_completed(futures):
+            # propagate unexpected exceptions raised by run_func
+            fut.result()
+
+
+def simulate(runs, max_jobs, num_cores, mem_budget=None):
+    """Replay run_concurrently on runs given as (num_threads, duration,
+    memory) tuples, in order, without executing them.
+
+    Returns the total duration (s) and the peak of the summed memory of
+    the concurrent runs (MB)
+    """
+    now = 0.0
+    running = []  # heap of (end, cores, memory) of the concurrent runs
+    free = num_cores
+    mem_used = 0
+    mem_peak = 0
+    for num_threads, duration, mem in runs:
+        num_cores_run = max(1, min(num_threads, num_cores))
+        while running and not (
+            free >= num_cores_run
+            and len(running) < max_jobs
+            and (mem_budget is None or mem_used + mem <= mem_budget)
+        ):
+            now, cores, mem_run = heapq.heappop(running)
+            free += cores
+            mem_used -= mem_run
+        heapq.heappush(running, (now + duration, num_cores_run, mem))
+        free -= num_cores_run
+        mem_used += mem
+        mem_peak = max(mem_peak, mem_used)
+    return max([now] + [end for end, _, _ in running]), mem_peak
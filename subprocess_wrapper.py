@@ -1,21 +1,261 @@
 import argparse
+import os
 import resource
+import shutil
 import subprocess
 import sys
+import tempfile
 import time
 
+import psutil
 
-def main(cmd):
+# perf events and their keys in the results
+PERF_EVENTS = {
+    "cycles": "Cycles",
+    "instructions": "Instructions",
+    "LLC-load-misses": "LLC Misses",
+    "branch-misses": "Branch Misses",
+    "context-switches": "Context Switches",
+}
+
+
+def read_pss(pid):
+    """Proportional Set Size (kB) of a process, 0 if unavailable"""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as src:
+            for line in src:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def perf_available():
+    """If perf can count the events of an unprivileged process"""
+    if shutil.which("perf") is None:
+        return False
+    try:
+        proc = subprocess.run(
+            ["perf", "stat", "-x", ",", "-e", "instructions", "--", "true"],
+            capture_output=True,
+            text=True,
+            timeout=10,
+            check=False,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return proc.returncode == 0 and "<not supported>" not in proc.stderr
+
+
+def read_perf(fname):
+    """Counters of a `perf stat -x ,` output file (unsupported or not
+    counted events are omitted)"""
+    counters = {}
+    with open(fname) as src:
+        for line in src:
+            fields = line.strip().split(",")
+            if len(fields) < 3 or line.startswith("#"):
+                continue
+            try:
+                val = int(float(fields[0]))
+            except ValueError:
+                # <not supported>, <not counted>
+                continue
+            # "cpu_core/cycles/" on hybrid CPUs, "cycles:u" without
+            # kernel profiling rights
+            event = fields[2]
+            if "/" in event:
+                event = event.split("/")[1]
+            event = event.split(":")[0]
+            if event in PERF_EVENTS:
+                key = PERF_EVENTS[event]
+                counters[key] = counters.get(key, 0) + val
+    if counters.get("Cycles") and "Instructions" in counters:
+        counters["IPC"] = round(counters["Instructions"] / counters["Cycles"], 3)
+    return counters
+
+
+class TreeMonitor:
+    """Sample the resources used by a process and all its descendants
+    (MPI ranks, JVM/Julia helpers...) through /proc"""
+
+    def __init__(self, pid, skip_root=False):
+        self.root = psutil.Process(pid)
+        # the root process is a measurement tool (perf)
+        self.skip_root = skip_root
+        self.beg = time.time()
+        # last known cumulated CPU time and I/O of every process of the
+        # tree (terminated processes still count)
+        self.cpu = {}
+        self.io = {}
+        self.last = (self.beg, 0.0)
+        self.trace = []
+        # I/O before the measurement (kB)
+        self.io0 = (0, 0)
+        # RSS and PSS before the measurement (kB)
+        self.mem0 = (0, 0)
+
+    def reset(self):
+        """Start a new measurement, not counting the resources used so
+        far (long-lived processes): the memory statistics are then the
+        growth over the memory of the process at this point"""
+        self.sample()
+        self.io0 = self.trace[-1][5:7]
+        self.mem0 = self.trace[-1][1:3]
+        self.trace = []
+        self.beg = time.time()
+
+    def processes(self):
+        try:
+            children = self.root.children(recursive=True)
+            return children if self.skip_root else [self.root] + children
+        except psutil.NoSuchProcess:
+            return []
+
+    def sample(self):
+        rss, pss, threads = 0, 0, 0
+        for proc in self.processes():
+            try:
+                with proc.oneshot():
+                    rss += proc.memory_info().rss // 1024
+                    threads += proc.num_threads()
+                    cpu = proc.cpu_times()
+                    self.cpu[proc.pid] = cpu.user + cpu.system
+                    try:
+                        io = proc.io_counters()
+                        self.io[proc.pid] = (io.read_bytes, io.write_bytes)
+                    except (psutil.AccessDenied, AttributeError):
+                        pass
+                pss += read_pss(proc.pid)
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                continue
+
+        now = time.time()
+        cpu_time = sum(self.cpu.values())
+        prev_time, prev_cpu = self.last
+        cpu_util = 100.0 * (cpu_time - prev_cpu) / max(now - prev_time, 1e-6)
+        self.last = (now, cpu_time)
+        read_b = sum(r for r, _ in self.io.values())
+        write_b = sum(w for _, w in self.io.values())
+
+        self.trace.append(
+            (
+                round(now - self.beg, 3),
+                rss,
+                pss,
+                round(cpu_util, 1),
+                threads,
+                read_b // 1024,
+                write_b // 1024,
+            )
+        )
+
+    def summary(self):
+        if not self.trace:
+            return {}
+        peak = max(self.trace, key=lambda s: s[1])
+        rss0, pss0 = self.mem0
+        mean = sum(s[1] for s in self.trace) / len(self.trace)
+        return {
+            "Peak Memory (kB)": max(peak[1] - rss0, 0),
+            "Mean Memory (kB)": max(round(mean) - rss0, 0),
+            "Time to Peak Memory (s)": peak[0],
+            "Peak PSS (kB)": max(max(s[2] for s in self.trace) - pss0, 0),
+            "Mean CPU Utilisation (%)": round(
+                sum(s[3] for s in self.trace) / len(self.trace), 1
+            ),
+            "Peak Threads": max(s[4] for s in self.trace),
+            "Read (kB)": self.trace[-1][5] - self.io0[0],
+            "Written (kB)": self.trace[-1][6] - self.io0[1],
+        }
+
+    def write_trace(self, fname):
+        with open(fname, "w") as dst:
+            dst.write("time_s,rss_kB,pss_kB,cpu_pct,threads,read_kB,write_kB\n")
+            for sample in self.trace:
+                dst.write(",".join(str(v) for v in sample) + "\n")
+
+
+def pin_child(cpus):
+    """Function restricting the child process (and its descendants) to
+    the given cores, to run before its command"""
+    if cpus is None:
+        return None
+    return lambda: os.sched_setaffinity(0, cpus)
+
+
+def main(cmd, cpus=None, rate=10.0, trace=None, perf=False):
+    if cpus is not None:
+        others = os.sched_getaffinity(0) - set(cpus)
+        if others:
+            # the sampling does not compete with the measured threads
+            os.sched_setaffinity(0, others)
+    perf_out = None
+    run_cmd = cmd
+    if perf and perf_available():
+        fd, perf_out = tempfile.mkstemp(suffix=".perf")
+        os.close(fd)
+        events = ",".join(PERF_EVENTS)
+        run_cmd = ["perf", "stat", "-x", ",", "-o", perf_out, "-e", events, "--"]
+        run_cmd += cmd
+    elif perf:
+        print("perf unavailable, only counting context switches", file=sys.stderr)
     beg = time.time()
-    subprocess.run(cmd, check=True)
-    end = time.time()
+    with subprocess.Popen(run_cmd, preexec_fn=pin_child(cpus)) as proc:
+        monitor = TreeMonitor(proc.pid, skip_root=perf_out is not None)
+        while True:
+            monitor.sample()
+            try:
+                # woken up as soon as the process exits
+                proc.wait(timeout=1.0 / rate)
+                break
+            except subprocess.TimeoutExpired:
+                continue
+        end = time.time()
+    counters = {}
+    if perf_out is not None:
+        counters = read_perf(perf_out)
+        os.remove(perf_out)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
     res = resource.getrusage(resource.RUSAGE_CHILDREN)
+    stats = monitor.summary()
+    # very short runs might finish before the first sample
+    stats["Peak Memory (kB)"] = max(stats.get("Peak Memory (kB)", 0), res.ru_maxrss)
+    if perf:
+        # context switches are also counted by the kernel
+        counters.setdefault("Context Switches", res.ru_nvcsw + res.ru_nivcsw)
+        stats.update({f"Perf {key}": val for key, val in counters.items()})
     print(f"Elapsed Time (s): {end - beg}", file=sys.stderr)
-    print(f"Peak Memory (kB): {res.ru_maxrss}", file=sys.stderr)
+    for key, val in stats.items():
+        print(f"{key}: {val}", file=sys.stderr)
+    if trace is not None:
+        monitor.write_trace(trace)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="GNU Time replacement")
+    parser.add_argument(
+        "--cpus",
+        type=lambda s: [int(c) for c in s.split(",")],
+        help="Comma-separated list of cores to pin the command on",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="Sampling rate of the process tree resources (Hz)",
+        default=10.0,
+    )
+    parser.add_argument(
+        "--trace",
+        help="Write the sampled resources time series into this CSV file",
+    )
+    parser.add_argument(
+        "--perf",
+        action="store_true",
+        help="Count hardware events (cycles, instructions...) with perf stat",
+    )
     parser.add_argument("cmd", nargs="+")
     args = parser.parse_args()
-    main(args.cmd)
+    main(args.cmd, args.cpus, args.rate, args.trace, args.perf)
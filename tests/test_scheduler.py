@@ -0,0 +1,31 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import placement  # noqa: E402
+import scheduler  # noqa: E402
+
+
+def scatter_order():
+    # two packages of two cores with two hardware threads each
+    topology = [
+        placement.CPU(cpu, cpu // 4, (cpu // 2) % 2, cpu // 4, cpu % 2)
+        for cpu in range(8)
+    ]
+    return placement.Placement.SCATTER.order_cpus(topology)
+
+
+def test_release_keeps_placement_order():
+    order = scatter_order()
+    assert order == [0, 4, 2, 6, 1, 5, 3, 7]
+    pool = scheduler.CorePool(order, max_jobs=4)
+    first = pool.acquire(2)
+    second = pool.acquire(3)
+    assert first == [0, 4]
+    assert second == [2, 6, 1]
+    pool.release(first)
+    assert pool.free == [0, 4, 5, 3, 7]
+    pool.release(second)
+    assert pool.free == order
+    assert pool.acquire(4) == order[:4]
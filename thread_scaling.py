@@ -0,0 +1,133 @@
+import argparse
+import json
+import statistics
+
+import history
+
+
+def get_thread_times(perfs, field="pers"):
+    """Measured time per number of threads of a backend on a dataset"""
+    res = {}
+    for mode, run in perfs.items():
+        if not isinstance(run, dict) or field not in run:
+            continue
+        nt = run.get("#threads", 1 if mode == "seq" else None)
+        if nt is not None:
+            res[int(nt)] = run[field]
+    return dict(sorted(res.items()))
+
+
+def fit_amdahl(thread_times):
+    """Fit T(n) = s + p / n (least squares in 1 / n) and return the
+    serial fraction s / (s + p) and the fitted sequential time s + p"""
+    if len(thread_times) < 2:
+        return None, None
+    xs = [1.0 / n for n in thread_times]
+    ys = list(thread_times.values())
+    mx = sum(xs) / len(xs)
+    my = sum(ys) / len(ys)
+    var = sum((x - mx) ** 2 for x in xs)
+    if var == 0.0:
+        return None, None
+    p = sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / var
+    s = my - p * mx
+    # clamp to the physically meaningful range
+    s, p = max(s, 0.0), max(p, 0.0)
+    if s + p == 0.0:
+        return None, None
+    return s / (s + p), s + p
+
+
+def scaling_report(times, field="pers"):
+    """Speedup, parallel efficiency and Amdahl serial fraction of every
+    backend on every dataset measured with several thread numbers"""
+    report = {}
+    for dsname, backends in times.items():
+        for backend, perfs in backends.items():
+            if not isinstance(perfs, dict):
+                continue
+            tt = get_thread_times(perfs, field)
+            if len(tt) < 2:
+                continue
+            serial_frac, t1_fit = fit_amdahl(tt)
+            t1 = tt.get(1, t1_fit)
+            points = []
+            for nt, t in tt.items():
+                speedup = t1 / t if t1 and t > 0 else None
+                points.append(
+                    {
+                        "#threads": nt,
+                        field: t,
+                        "speedup": None if speedup is None else round(speedup, 3),
+                        "efficiency": (
+                            None if speedup is None else round(speedup / nt, 3)
+                        ),
+                    }
+                )
+            report.setdefault(backend, {})[dsname] = {
+                "points": points,
+                "serial_fraction": (
+                    None if serial_frac is None else round(serial_frac, 4)
+                ),
+            }
+
+    # aggregate per backend
+    summary = {}
+    for backend, datasets in report.items():
+        fracs = [
+            d["serial_fraction"]
+            for d in datasets.values()
+            if d["serial_fraction"] is not None
+        ]
+        speedups = {}
+        for d in datasets.values():
+            for pt in d["points"]:
+                if pt["speedup"] is not None:
+                    speedups.setdefault(pt["#threads"], []).append(pt["speedup"])
+        summary[backend] = {
+            "median_serial_fraction": (
+                round(statistics.median(fracs), 4) if fracs else None
+            ),
+            "median_speedup": {
+                nt: round(statistics.median(s), 3) for nt, s in sorted(speedups.items())
+            },
+        }
+    return {"summary": summary, "datasets": report}
+
+
+def print_summary(report):
+    for backend, res in report["summary"].items():
+        print(f"{backend}: serial fraction {res['median_serial_fraction']}")
+        for nt, speedup in res["median_speedup"].items():
+            print(
+                f"  {nt:4d} threads: speedup {speedup:8.3f}, efficiency {speedup / nt:.3f}"
+            )
+
+
+def main(results, output="thread_scaling.json", field="pers"):
+    # the sweeps of a dataset may be split over several results files
+    times = history.load_results(results)
+    report = scaling_report(times, field)
+    with open(output, "w") as dst:
+        json.dump(report, dst, indent=4)
+    print_summary(report)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Speedup, efficiency and Amdahl fit of thread-scaling sweeps"
+    )
+    parser.add_argument("results", nargs="+", help="Results files")
+    parser.add_argument(
+        "-o", "--output", help="Output report", default="thread_scaling.json"
+    )
+    parser.add_argument(
+        "-f",
+        "--field",
+        help="Measured time field",
+        choices=["prec", "pers"],
+        default="pers",
+    )
+    args = parser.parse_args()
+    main(args.results, args.output, args.field)
@@ -0,0 +1,281 @@
+import argparse
+import importlib
+import json
+import os
+import runpy
+import select
+import signal
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+import psutil
+
+from subprocess_wrapper import TreeMonitor
+
+
+def set_affinity(cpus):
+    """Pin every thread of this process (including the thread pools of
+    the previous requests) on the given cores"""
+    for tid in os.listdir("/proc/self/task"):
+        try:
+            os.sched_setaffinity(int(tid), cpus)
+        except OSError:
+            # thread terminated in the meantime
+            pass
+
+
+class Redirect:
+    """Redirect the stdout and stderr file descriptors of this process
+    (also written by the C/C++ libraries) into files"""
+
+    def __init__(self, out, err):
+        self.files = (out, err)
+        self.saved = []
+
+    def __enter__(self):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        for fd, fname in zip([1, 2], self.files):
+            self.saved.append(os.dup(fd))
+            dst = os.open(fname, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            os.dup2(dst, fd)
+            os.close(dst)
+        return self
+
+    def __exit__(self, *exc):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        for fd, saved in zip([1, 2], self.saved):
+            os.dup2(saved, fd)
+            os.close(saved)
+        self.saved = []
+
+
+def run_request(script, req):
+    """Execute a script as `python3 script argv...` would, sampling the
+    resources of this process (and of its children) meanwhile.
+
+    Returns the exit code and the subprocess_wrapper.py statistics
+    """
+    if req.get("cpus") is not None:
+        set_affinity(req["cpus"])
+    monitor = TreeMonitor(os.getpid())
+    # the cumulated CPU time and I/O of the previous requests
+    monitor.reset()
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(1.0 / req.get("rate", 10.0)):
+            monitor.sample()
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    cwd = os.getcwd()
+    argv, path = sys.argv, list(sys.path)
+    code = 0
+    beg = time.time()
+    sampler.start()
+    with Redirect(req["out"], req["err"]):
+        try:
+            os.chdir(req.get("cwd") or cwd)
+            sys.argv = [script] + req["argv"]
+            runpy.run_path(script, run_name="__main__")
+        except SystemExit as exc:
+            if exc.code is None:
+                code = 0
+            elif isinstance(exc.code, int):
+                code = exc.code
+            else:
+                print(exc.code, file=sys.stderr)
+                code = 1
+        except BaseException:  # pylint: disable=W0703
+            traceback.print_exc()
+            code = 1
+        finally:
+            os.chdir(cwd)
+            sys.argv, sys.path[:] = argv, path
+    end = time.time()
+    stop.set()
+    sampler.join()
+    monitor.sample()
+
+    stats = {"Elapsed Time (s)": end - beg}
+    stats.update(monitor.summary())
+    if req.get("trace") is not None:
+        monitor.write_trace(req["trace"])
+    return code, stats
+
+
+def serve(script, preload, paths):
+    """Worker loop: import the libraries of a Python backend once, then
+    run the requests (one JSON object per line) read on stdin. Replies
+    (one JSON object per line) are written on the original stdout, the
+    outputs of the script are redirected to the files of each request.
+    """
+    proto = os.fdopen(os.dup(1), "w")
+    # stray outputs between requests must not corrupt the protocol
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+    sys.path[:0] = paths
+    modules = []
+    for mod in preload:
+        try:
+            importlib.import_module(mod)
+            modules.append(mod)
+        except ImportError:
+            pass
+    try:
+        # the top-level imports of the script
+        runpy.run_path(script, run_name="warm_worker")
+    except ImportError:
+        # reported by the requests
+        pass
+    rss = psutil.Process().memory_info().rss // 1024
+    proto.write(json.dumps({"ready": True, "modules": modules, "rss": rss}) + "\n")
+    proto.flush()
+
+    for line in sys.stdin:
+        req = json.loads(line)
+        code, stats = run_request(script, req)
+        proto.write(json.dumps({"returncode": code, "stats": stats}) + "\n")
+        proto.flush()
+
+
+class WarmWorker:
+    """Long-lived Python process running a backend script on request,
+    with its libraries already imported"""
+
+    def __init__(self, script, preload=(), paths=(), env=None):
+        self.script = script
+        cmd = [sys.executable, os.path.abspath(__file__), script]
+        cmd += ["--preload", *preload, "--paths", *paths]
+        self.cmd = cmd
+        beg = time.time()
+        # own process group: killed with the children of the script
+        self.proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+            start_new_session=True,
+        )
+        self.buf = b""
+        ready = json.loads(self.read_line(None))
+        # interpreter start-up and libraries imports
+        self.startup = {
+            "time": round(time.time() - beg, 3),
+            "mem": round(ready["rss"] / 1000),
+            "modules": ready["modules"],
+        }
+
+    def read_line(self, timeout):
+        deadline = None if timeout is None else time.time() + timeout
+        fd = self.proc.stdout.fileno()
+        while b"\n" not in self.buf:
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                raise subprocess.TimeoutExpired(self.cmd, timeout)
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 1 << 16)
+            if not chunk:
+                raise EOFError(f"Warm worker of {self.script} exited")
+            self.buf += chunk
+        line, self.buf = self.buf.split(b"\n", 1)
+        return line.decode()
+
+    def run(self, argv, timeout, out, err, cwd=None, cpus=None, trace=None, rate=10.0):
+        """Run the script with the given arguments, its stdout and stderr
+        appended to the `out` and `err` files. Returns the exit code and
+        the statistics of subprocess_wrapper.py"""
+        req = {
+            "argv": argv,
+            "cwd": cwd,
+            "cpus": cpus,
+            "out": out,
+            "err": err,
+            "trace": trace,
+            "rate": rate,
+        }
+        self.proc.stdin.write((json.dumps(req) + "\n").encode())
+        self.proc.stdin.flush()
+        try:
+            rep = json.loads(self.read_line(timeout))
+        except subprocess.TimeoutExpired:
+            self.kill()
+            raise
+        except EOFError:
+            # the worker crashed (segmentation fault, out of memory...)
+            self.proc.wait()
+            return self.proc.returncode or 1, {}
+        return rep["returncode"], rep["stats"]
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def kill(self):
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.proc.wait()
+
+    def close(self):
+        self.proc.stdin.close()
+        try:
+            self.proc.wait(10)
+        except subprocess.TimeoutExpired:
+            self.kill()
+
+
+class WarmPool:
+    """Idle warm workers per backend script, shared by the threads of
+    the concurrent scheduler (a busy worker is never shared)"""
+
+    def __init__(self):
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, script, preload=(), paths=(), env=None):
+        """An idle worker of a script (started if none is available) and
+        whether it was just started"""
+        with self.lock:
+            workers = self.idle.get(script, [])
+            while workers:
+                worker = workers.pop()
+                if worker.alive():
+                    return worker, False
+        return WarmWorker(script, preload, paths, env), True
+
+    def release(self, worker):
+        if not worker.alive():
+            return
+        with self.lock:
+            self.idle.setdefault(worker.script, []).append(worker)
+
+    def close(self):
+        with self.lock:
+            for workers in self.idle.values():
+                for worker in workers:
+                    worker.close()
+            self.idle = {}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run a Python backend script on request, libraries imported once"
+    )
+    parser.add_argument("script", help="Python backend script")
+    parser.add_argument(
+        "--preload", nargs="*", default=[], help="Modules to import at start-up"
+    )
+    parser.add_argument(
+        "--paths", nargs="*", default=[], help="Directories prepended to sys.path"
+    )
+    args = parser.parse_args()
+    serve(args.script, args.preload, args.paths)
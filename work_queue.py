@@ -0,0 +1,170 @@
+import contextlib
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS params (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    fname TEXT,
+    backend TEXT,
+    num_threads INTEGER,
+    state TEXT DEFAULT 'pending',
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER DEFAULT 0,
+    UNIQUE (fname, backend, num_threads)
+);
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    record TEXT
+);
+"""
+
+
+class WorkQueue:
+    """Queue of backend runs shared by several workers, stored in a
+    SQLite database (on a shared directory whose filesystem supports
+    file locks for workers on several nodes).
+
+    Units are claimed with a lease that the worker renews while the run
+    goes on: the unit of a dead worker is claimed again once its lease
+    expires (at most `max_attempts` times). Workers push journal
+    records (see run_journal.py), so that `append` can replace the
+    journal of a local campaign.
+    """
+
+    def __init__(self, fname, max_attempts=3):
+        self.fname = fname
+        self.max_attempts = max_attempts
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # one connection per operation: usable from any thread
+        db = sqlite3.connect(self.fname, timeout=60, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self._connect() as db:
+            # take the write lock immediately (no lost claim)
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def publish(self, units, params):
+        """Add (fname, backend, num_threads) units to the queue and
+        store the campaign parameters. Returns the number of new units."""
+        with self._transaction() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO params VALUES (?, ?)",
+                [(k, json.dumps(v)) for k, v in params.items()],
+            )
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO units (fname, backend, num_threads) "
+                "VALUES (?, ?, ?)",
+                units,
+            )
+            return db.total_changes - before
+
+    def params(self):
+        with self._connect() as db:
+            rows = db.execute("SELECT key, value FROM params").fetchall()
+        return {k: json.loads(v) for k, v in rows}
+
+    def claim(self, worker, lease):
+        """Lease the first pending unit (or a unit whose lease expired)
+        for `lease` seconds. Returns (id, fname, backend, num_threads),
+        None if no unit is available."""
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE units SET state = 'failed' WHERE state = 'running' "
+                "AND lease_until < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            )
+            row = db.execute(
+                "SELECT id, fname, backend, num_threads FROM units "
+                "WHERE state = 'pending' "
+                "OR (state = 'running' AND lease_until < ?) "
+                "ORDER BY id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE units SET state = 'running', worker = ?, "
+                "lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                (worker, now + lease, row[0]),
+            )
+            return row
+
+    def renew(self, unit_id, worker, lease):
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE units SET lease_until = ? "
+                "WHERE id = ? AND worker = ? AND state = 'running'",
+                (time.time() + lease, unit_id, worker),
+            )
+
+    @contextlib.contextmanager
+    def lease(self, unit_id, worker, lease):
+        """Renew the lease of a unit in a background thread while the
+        context is active"""
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(lease / 3):
+                self.renew(unit_id, worker, lease)
+
+        thread = threading.Thread(target=heartbeat, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def complete(self, unit_id, worker):
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE units SET state = 'done' WHERE id = ? AND worker = ?",
+                (unit_id, worker),
+            )
+
+    def append(self, record):
+        """Push the journal record of a completed run"""
+        with self._transaction() as db:
+            db.execute("INSERT INTO records (record) VALUES (?)", (json.dumps(record),))
+
+    def records(self):
+        with self._connect() as db:
+            rows = db.execute("SELECT record FROM records ORDER BY id").fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def status(self):
+        """Number of units per state"""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT state, COUNT(*) FROM units GROUP BY state"
+            ).fetchall()
+        return dict(rows)
+
+    def unfinished(self):
+        status = self.status()
+        return status.get("pending", 0) + status.get("running", 0)